@@ -277,6 +277,10 @@ def find_and_remove_dir(args_tuple: tuple) -> tuple:
     
     return (False, None)
 
+def remove_batch(batch: list) -> list:
+    """Remove a batch of directories in one pool task; returns their (success, error_msg) results."""
+    return [find_and_remove_dir(item) for item in batch]
+
 if 'local_file_name' in df.columns and audio_dir.exists():
     rows_to_remove = df[df['singer_id'].isna()]
     
@@ -284,9 +288,10 @@ if 'local_file_name' in df.columns and audio_dir.exists():
         print(f"\nRemoving {len(rows_to_remove)} audio directories from filesystem...")
         
         # Prepare work items
+        audio_dir_str = str(audio_dir)
         work_items = [
-            (row.get('local_file_name'), str(audio_dir))
-            for _, row in rows_to_remove.iterrows()
+            (local_file_name, audio_dir_str)
+            for local_file_name in rows_to_remove['local_file_name']
         ]
         
         removed_dirs = 0
@@ -307,16 +312,22 @@ if 'local_file_name' in df.columns and audio_dir.exists():
             num_workers = min(32, multiprocessing.cpu_count() * 2)
             print(f"Processing with {num_workers} parallel workers...")
             
+            # One future per batch rather than per directory; ~16 batches per worker keeps the load balanced
+            chunksize = max(1, len(work_items) // (num_workers * 16))
+            batches = [work_items[i:i + chunksize] for i in range(0, len(work_items), chunksize)]
+            
             with ThreadPoolExecutor(max_workers=num_workers) as executor:
-                futures = {executor.submit(find_and_remove_dir, item): item for item in work_items}
+                futures = {executor.submit(remove_batch, batch): len(batch) for batch in batches}
                 
-                for future in tqdm(as_completed(futures), total=len(futures), desc="Removing directories"):
-                    success, error_msg = future.result()
-                    if success:
-                        removed_dirs += 1
-                    elif error_msg:
-                        failed_removals += 1
-                        print(f"  ⚠️  Warning: {error_msg}")
+                with tqdm(total=len(work_items), desc="Removing directories") as pbar:
+                    for future in as_completed(futures):
+                        for success, error_msg in future.result():
+                            if success:
+                                removed_dirs += 1
+                            elif error_msg:
+                                failed_removals += 1
+                                print(f"  ⚠️  Warning: {error_msg}")
+                        pbar.update(futures[future])
         
         print(f"\nFilesystem cleanup complete:")
         print(f"  ✅ Successfully removed: {removed_dirs} directories")
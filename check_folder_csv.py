@@ -110,10 +110,10 @@ print("Extracting song names from CSV...")
 csv_names_no_wav = {}  # Set 1: Basenames with .wav removed -> original gcs_link
 
 # Track the index of each filename to map back to the dataframe
-for index, row in tqdm(df.iterrows(), total=len(df), desc="Extracting song names"):
+# Zip the index with the one column we need instead of boxing every row into a Series
+links = df[args.uri_name_header].to_numpy()
+for index, link in tqdm(zip(df.index, links), total=len(df), desc="Extracting song names"):
     try:
-        link = row[args.uri_name_header]
-        
         # Extract track name based on URI structure
         if args.gs_file_uri_in_csv:
             # URI contains full file path like gs://bucket/path/track_name/vocals.wav
@@ -127,7 +127,7 @@ for index, row in tqdm(df.iterrows(), total=len(df), desc="Extracting song names
         if not songname.endswith('.wav'):
             csv_names_no_wav[songname] = index
     except:
-        print(f"Error extracting song name from {row}")
+        print(f"Error extracting song name from {link}")
         continue
 
 # Get all items in data_dir_path directory (only depth 1, no subdirectories)
@@ -15,7 +15,6 @@ import sys
 from typing import Dict, List, Optional
 
 import soundfile as sf
-import librosa
 
 
 # Supported audio extensions
@@ -36,8 +35,11 @@ def get_audio_duration(filepath: str) -> Optional[float]:
         except Exception:
             pass
     
-    # Use librosa for mp3 and other formats (uses ffmpeg/audioread backend)
+    # Use librosa for mp3 and other formats (uses ffmpeg/audioread backend).
+    # Imported here: librosa pulls in numba, whose import and JIT setup cost seconds,
+    # and a directory of wav/flac files never needs it.
     try:
+        import librosa
         duration = librosa.get_duration(path=filepath)
         return duration
     except Exception:
@@ -5,6 +5,7 @@ Splits singers randomly into train (80%), validation (10%), and test (10%) sets,
 moves singer directories to respective subdirectories, and creates CSV with split assignments.
 """
 import argparse
+import hashlib
 import pandas as pd
 import numpy as np
 import os
@@ -65,7 +66,9 @@ output_file = input_csv_path  # Edit the input file in place
 
 print("Loading dataframe...")
 # load dataframe
-df = pd.read_csv(input_csv_path)
+# Every column but the split is passed through unchanged, so read them as text:
+# no per-column type inference, and values are written back exactly as they were read
+df = pd.read_csv(input_csv_path, dtype=str, keep_default_na=False, engine="c")
 
 # Get unique singer IDs
 unique_singer_ids = df[args.singer_id_header].unique()
@@ -75,8 +78,36 @@ print(f"Total unique singer IDs: {total_singers}")
 # Initialize singer_split_map
 singer_split_map = {}
 
-# Check if reference dataset is provided
+# The split only depends on the singer IDs, the seed and the reference dataset's split
+# folders, so a rerun with the same inputs reuses the previous assignment from .cache.
+# Only the singer ID column is hashed: this script rewrites the CSV with a split column.
+split_key = hashlib.blake2b(digest_size=16)
+split_key.update("\n".join(sorted(unique_singer_ids)).encode("utf-8"))
+split_key.update(f"\nseed={args.seed}\n".encode("utf-8"))
 if args.reference_dataset_path:
+    split_key.update(str(Path(args.reference_dataset_path).resolve()).encode("utf-8"))
+    for split_dir in ('train', 'test', 'exp'):
+        ref_split_path = Path(args.reference_dataset_path) / "audio" / split_dir
+        mtime = ref_split_path.stat().st_mtime_ns if ref_split_path.exists() else None
+        split_key.update(f"\n{split_dir}={mtime}".encode("utf-8"))
+split_cache_path = dataset_directory / ".cache" / f"split.{split_key.hexdigest()}.csv"
+
+cache_hit = split_cache_path.exists()
+if cache_hit:
+    print(f"\nReusing cached split from {split_cache_path}")
+    cached = pd.read_csv(split_cache_path, dtype=str, keep_default_na=False, engine="c")
+    known_singer_ids = set(unique_singer_ids)
+    singer_split_map = {
+        singer_id: split
+        for singer_id, split in zip(cached['singer_id'], cached['split'])
+        if singer_id in known_singer_ids
+    }
+    train_singers = [sid for sid, split in singer_split_map.items() if split == 'train']
+    val_singers = [sid for sid, split in singer_split_map.items() if split == 'test']
+    test_singers = [sid for sid, split in singer_split_map.items() if split == 'exp']
+
+# Check if reference dataset is provided
+if args.reference_dataset_path and not cache_hit:
     print(f"\nUsing reference dataset: {args.reference_dataset_path}")
     reference_path = Path(args.reference_dataset_path)
     reference_audio_path = reference_path / "audio"
@@ -153,7 +184,7 @@ if args.reference_dataset_path:
         print(f"Exp: {len(test_singers)} singers")
 
 # If no reference dataset, use random split (original behavior)
-if not args.reference_dataset_path:
+if not args.reference_dataset_path and not cache_hit:
     # Calculate split sizes (80:10:10)
     num_train = int(total_singers * 0.8)
     num_val = int(total_singers * 0.1)
@@ -221,16 +252,22 @@ if len(test_singers) < min_singers_per_split:
     else:
         print(f"Warning: Cannot ensure {min_singers_per_split} singers in exp set. Only {len(train_singers)} available in train.")
 
+if not cache_hit:
+    split_cache_path.parent.mkdir(exist_ok=True)
+    # Drop assignments from earlier inputs; only the latest one can be reused
+    for old_cache in split_cache_path.parent.glob("split.*.csv"):
+        old_cache.unlink()
+    pd.DataFrame(
+        {'singer_id': list(singer_split_map.keys()), 'split': list(singer_split_map.values())}
+    ).to_csv(split_cache_path, index=False)
+
 print(f"\nFinal split after adjustments:")
 print(f"Train: {len(train_singers)} singers")
 print(f"Test (val): {len(val_singers)} singers")
 print(f"Exp: {len(test_singers)} singers")
 
-# Add split column to dataframe
-def assign_split(singer_id):
-    return singer_split_map.get(singer_id, 'train')
-
-df['split'] = df[args.singer_id_header].apply(assign_split)
+# Add split column to dataframe: one vectorised dict lookup, singers not in the map go to train
+df['split'] = df[args.singer_id_header].map(singer_split_map).fillna('train')
 
 # Convert to numeric for consistency
 df['split'] = df['split'].map({'train': 0, 'test': 1, 'exp': 2})
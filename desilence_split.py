@@ -7,29 +7,179 @@ silence, and saves segments to {dataset_path}/audio/<track_name>/<#####.wav>.
 """
 import argparse
 import logging
+import logging.handlers
 import os
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import wave
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 from pydub import AudioSegment
-from pydub.silence import split_on_silence
 from tqdm import tqdm
 
 # -----------------------------------------------------------------------------
 # Logging
 # -----------------------------------------------------------------------------
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[logging.StreamHandler(), logging.FileHandler("analyse_split_audio.log")],
-)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def _step_logging():
+    """
+    Main process: log to the console and to analyse_split_audio.log while the step runs.
+    Called in-process after another step configured root logging (preprocessing.py),
+    basicConfig would be a no-op, so this step's file handler temporarily replaces the
+    other file handlers and they are put back afterwards.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(
+            level=logging.INFO,
+            format=LOG_FORMAT,
+            handlers=[logging.StreamHandler(), logging.FileHandler("analyse_split_audio.log")],
+        )
+        yield
+        return
+
+    file_handler = logging.FileHandler("analyse_split_audio.log")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    displaced = [h for h in root.handlers if isinstance(h, logging.FileHandler)]
+    for h in displaced:
+        root.removeHandler(h)
+    root.addHandler(file_handler)
+    try:
+        yield
+    finally:
+        root.removeHandler(file_handler)
+        file_handler.close()
+        for h in displaced:
+            root.addHandler(h)
+
+
+def _worker_init(log_queue) -> None:
+    """
+    Pool initializer: workers only enqueue log records; the main process's
+    QueueListener performs the single console/file write.
+    """
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+
+
 # -----------------------------------------------------------------------------
 # Worker
 # -----------------------------------------------------------------------------
+def write_wav(seg: AudioSegment, path: str) -> None:
+    """Write a segment's PCM data straight to a WAV file with the stdlib wave module."""
+    with wave.open(path, "wb") as w:
+        w.setnchannels(seg.channels)
+        w.setsampwidth(seg.sample_width)
+        w.setframerate(seg.frame_rate)
+        w.writeframes(seg.raw_data)
+
+
+# Silence detection is done in chunks of this many ms to bound the float64 scratch size.
+ENERGY_CHUNK_MS = 60_000
+
+
+def _window_rms(audio: AudioSegment, window_ms: int, starts: np.ndarray) -> np.ndarray:
+    """
+    RMS of audio[s:s + window_ms] for every start s (in ms), matching audioop.rms on
+    the same slice. Squared samples are summed per millisecond once; each window is
+    then a difference of two cumulative sums instead of a pass over its samples.
+    """
+    samples = np.asarray(audio.get_array_of_samples())
+    seg_len = len(audio)
+    # First sample of every ms boundary, with AudioSegment's ms -> frame rounding
+    bounds = (np.arange(seg_len + 1) * (audio.frame_rate / 1000.0)).astype(np.int64)
+    bounds = np.minimum(bounds * audio.channels, samples.size)
+
+    ms_energy = np.empty(seg_len, dtype=np.float64)
+    for lo in range(0, seg_len, ENERGY_CHUNK_MS):
+        hi = min(lo + ENERGY_CHUNK_MS, seg_len)
+        sq = samples[bounds[lo]:bounds[hi]].astype(np.float64)
+        sq *= sq
+        cs = np.concatenate(([0.0], np.cumsum(sq)))
+        ms_energy[lo:hi] = np.diff(cs[bounds[lo:hi + 1] - bounds[lo]])
+
+    cum = np.concatenate(([0.0], np.cumsum(ms_energy)))
+    ends = starts + window_ms
+    counts = bounds[ends] - bounds[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rms = np.floor(np.sqrt((cum[ends] - cum[starts]) / counts))
+    return np.where(counts > 0, rms, 0.0)
+
+
+def nonsilent_ranges(
+    audio: AudioSegment,
+    min_silence_len: int,
+    silence_thresh: int,
+    seek_step: int,
+) -> list:
+    """
+    Vectorised pydub.silence.detect_nonsilent: same windows, threshold and merge
+    rules, returning [start_ms, end_ms] pairs of non-silent audio.
+    """
+    seg_len = len(audio)
+    if seg_len < min_silence_len:
+        return [[0, seg_len]]
+
+    last_start = seg_len - min_silence_len
+    starts = np.arange(0, last_start + 1, seek_step)
+    if last_start % seek_step:
+        starts = np.append(starts, last_start)
+    thresh = 10 ** (silence_thresh / 20.0) * audio.max_possible_amplitude
+    silent_starts = starts[_window_rms(audio, min_silence_len, starts) <= thresh]
+    if silent_starts.size == 0:
+        return [[0, seg_len]]
+
+    # A silent run ends where the next silent window neither follows on by one
+    # seek_step nor overlaps the previous window
+    gaps = np.diff(silent_starts)
+    breaks = np.flatnonzero((gaps != seek_step) & (gaps > min_silence_len))
+    run_starts = np.concatenate((silent_starts[:1], silent_starts[breaks + 1]))
+    run_ends = np.concatenate((silent_starts[breaks], silent_starts[-1:])) + min_silence_len
+    silent = list(zip(run_starts.tolist(), run_ends.tolist()))
+
+    if silent[0] == (0, seg_len):
+        return []
+    ranges = []
+    prev_end = 0
+    for start, end in silent:
+        ranges.append([prev_end, start])
+        prev_end = end
+    if prev_end != seg_len:
+        ranges.append([prev_end, seg_len])
+    if ranges[0] == [0, 0]:
+        ranges.pop(0)
+    return ranges
+
+
+def split_on_silence(
+    audio: AudioSegment,
+    min_silence_len: int,
+    silence_thresh: int,
+    keep_silence: int,
+    seek_step: int,
+) -> list:
+    """pydub.silence.split_on_silence on top of the vectorised nonsilent_ranges."""
+    output_ranges = [
+        [start - keep_silence, end + keep_silence]
+        for start, end in nonsilent_ranges(audio, min_silence_len, silence_thresh, seek_step)
+    ]
+    # Split overlapping padding between neighbouring segments
+    for left, right in zip(output_ranges, output_ranges[1:]):
+        if right[0] < left[1]:
+            left[1] = (left[1] + right[0]) // 2
+            right[0] = left[1]
+    seg_len = len(audio)
+    return [audio[max(start, 0):min(end, seg_len)] for start, end in output_ranges]
+
+
 def split_audio_file(
     audio_path: str,
     output_base_dir: str,
@@ -37,6 +187,7 @@ def split_audio_file(
     silence_thresh: int,
     keep_silence: int,
     min_segment_len: int,
+    seek_step: int = 50,
 ) -> None:
     """
     - Loads audio file
@@ -64,6 +215,7 @@ def split_audio_file(
             min_silence_len=min_silence_len,
             silence_thresh=silence_thresh,
             keep_silence=keep_silence,
+            seek_step=seek_step,
         )
         valid = [seg for seg in segments if len(seg) >= min_segment_len]
         logger.info(f"[{track_name}] found {len(valid)} ≥{min_segment_len} ms segments")
@@ -71,13 +223,75 @@ def split_audio_file(
         # Export segments
         for idx, seg in enumerate(valid, start=1):
             fname = f"{idx:05d}.wav"
-            seg.export(str(out_base / fname), format="wav")
+            write_wav(seg, str(out_base / fname))
             
     except Exception as e:
         logger.error(f"[{track_name}] processing failed: {e}")
         return
 
 
+# -----------------------------------------------------------------------------
+# Cleanup
+# -----------------------------------------------------------------------------
+def remove_empty_dirs(root: Path) -> int:
+    """
+    Remove every empty directory below `root` (never `root` itself), deepest first.
+
+    Each directory is read exactly once with os.scandir; a parent is only removed
+    once all of its children have been removed. Returns the number of directories removed.
+    """
+    removed = 0
+
+    def _clean(path: str) -> bool:
+        nonlocal removed
+        try:
+            it = os.scandir(path)
+        except OSError as e:
+            logger.warning(f"Could not scan {path}: {e}")
+            return False
+        empty = True
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if not _clean(entry.path):
+                        empty = False
+                else:
+                    empty = False
+        if not empty or path == root_str:
+            return empty
+        try:
+            os.rmdir(path)
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+            return False
+        removed += 1
+        logger.debug(f"Removed empty directory: {path}")
+        return True
+
+    root_str = str(root)
+    _clean(root_str)
+    return removed
+
+
+def _split_all(exe, tasks, min_silence_len, silence_thresh, keep_silence, min_segment_len, seek_step) -> None:
+    """Submit one split_audio_file task per (wav, output dir) pair and wait for all of them."""
+    futures = {
+        exe.submit(
+            split_audio_file,
+            str(audio_path),
+            str(output_base_dir),
+            min_silence_len,
+            silence_thresh,
+            keep_silence,
+            min_segment_len,
+            seek_step,
+        ): audio_path
+        for audio_path, output_base_dir in tasks
+    }
+    for _ in tqdm(as_completed(futures), total=len(futures), desc="Splitting"):
+        pass
+
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
@@ -88,6 +302,23 @@ def main(
     keep_silence: int,
     min_segment_len: int,
     includes_audio_subdirs: bool,
+    seek_step: int = 50,
+    executor: Optional[Executor] = None,
+):
+    """
+    Split every .wav under the audio dir on silence. If `executor` is given, tasks run
+    on that caller-owned pool, whose workers must already forward their logging.
+    """
+    with _step_logging():
+        _split_dataset(
+            dataset_path, min_silence_len, silence_thresh, keep_silence,
+            min_segment_len, includes_audio_subdirs, seek_step, executor,
+        )
+
+
+def _split_dataset(
+    dataset_path, min_silence_len, silence_thresh, keep_silence,
+    min_segment_len, includes_audio_subdirs, seek_step, executor,
 ):
     dataset_path = Path(dataset_path)
     if includes_audio_subdirs:
@@ -115,41 +346,32 @@ def main(
     num_workers = multiprocessing.cpu_count()
     logger.info(f"Using {num_workers} parallel processes")
 
-    with ProcessPoolExecutor(max_workers=num_workers) as exe:
-        futures = {
-            exe.submit(
-                split_audio_file,
-                str(audio_path),
-                str(output_base_dir),
-                min_silence_len,
-                silence_thresh,
-                keep_silence,
-                min_segment_len,
-            ): audio_path
-            for audio_path, output_base_dir in tasks
-        }
-        for _ in tqdm(as_completed(futures), total=len(futures), desc="Splitting"):
-            pass
+    if executor is None:
+        # forkserver workers start from a clean template process instead of a fork of this
+        # (already heavy) interpreter, which keeps per-worker RSS and restart cost down.
+        ctx = multiprocessing.get_context("forkserver")
+        log_queue = ctx.Queue()
+        listener = logging.handlers.QueueListener(
+            log_queue, *logging.getLogger().handlers, respect_handler_level=True
+        )
+        listener.start()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=ctx,
+                initializer=_worker_init,
+                initargs=(log_queue,),
+            ) as exe:
+                _split_all(exe, tasks, min_silence_len, silence_thresh, keep_silence, min_segment_len, seek_step)
+        finally:
+            listener.stop()
+    else:
+        _split_all(executor, tasks, min_silence_len, silence_thresh, keep_silence, min_segment_len, seek_step)
 
     # Remove empty subdirectories (bottom-up)
     logger.info("Checking for and removing empty subdirectories...")
     if dataset_audio_dir.exists():
-        all_dirs = []
-        for root, dirs, files in os.walk(dataset_audio_dir, topdown=False):
-            root_path = Path(root)
-            if root_path != dataset_audio_dir:
-                depth = len(root_path.relative_to(dataset_audio_dir).parts)
-                all_dirs.append((depth, root_path))
-        all_dirs.sort(key=lambda x: x[0], reverse=True)
-        removed_count = 0
-        for depth, dir_path in all_dirs:
-            try:
-                if dir_path.exists() and not any(dir_path.iterdir()):
-                    dir_path.rmdir()
-                    removed_count += 1
-                    logger.debug(f"Removed empty directory: {dir_path}")
-            except OSError as e:
-                logger.warning(f"Could not remove {dir_path}: {e}")
+        removed_count = remove_empty_dirs(dataset_audio_dir)
         if removed_count > 0:
             logger.info(f"Removed {removed_count} empty subdirectories")
         else:
@@ -193,6 +415,9 @@ if __name__ == "__main__":
     p.add_argument(
         "--min_segment_len", type=int, default=3000, help="ms minimum segment length"
     )
+    p.add_argument(
+        "--seek_step", type=int, default=50, help="ms step between silence checks (1 = check every ms)"
+    )
     p.add_argument(
         "--includes_audio_subdirs", action="store_true", help="Whether to include audio subdirectories in the output"
     )
@@ -204,6 +429,7 @@ if __name__ == "__main__":
         silence_thresh=args.silence_thresh,
         keep_silence=args.keep_silence,
         min_segment_len=args.min_segment_len,
-        includes_audio_subdirs=args.includes_audio_subdirs
+        includes_audio_subdirs=args.includes_audio_subdirs,
+        seek_step=args.seek_step,
     )
 
@@ -6,18 +6,25 @@ Downloads CSV from GCS, extracts audio URIs, downloads each audio file,
 resamples to 16kHz mono, and saves to {datasets_dir}/{ds_name}/audio/.
 """
 import argparse
-import csv
+import io
 import logging
 import os
 import multiprocessing
 import shutil
 import tempfile
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Tuple
+from typing import List, Tuple
 
+import numpy as np
+import pandas as pd
+import soundfile as sf
+import soxr
+from google.api_core.exceptions import NotFound, RequestRangeNotSatisfiable
 from google.cloud import storage
-from pydub import AudioSegment
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 # -----------------------------------------------------------------------------
@@ -34,11 +41,26 @@ logger = logging.getLogger(__name__)
 # -----------------------------------------------------------------------------
 # GCS helper
 # -----------------------------------------------------------------------------
-def make_storage_client():
-    return storage.Client()
+# Download threads in the threaded path, and range-read threads each may start for a large blob.
+MAX_DOWNLOAD_THREADS = 64
+# Kept small: each pool worker already runs its own downloads in parallel.
+DOWNLOAD_CHUNK_WORKERS = 4
+# Enough pooled HTTPS connections for every range read of every download thread at once,
+# so no connection is discarded and re-opened when the pool overflows.
+HTTP_POOL_SIZE = MAX_DOWNLOAD_THREADS * DOWNLOAD_CHUNK_WORKERS
 
 
-STORAGE = make_storage_client()
+@lru_cache(maxsize=1)
+def _client() -> storage.Client:
+    """
+    Lazily create one storage client per process and reuse it (and its authorized
+    HTTP session, TLS connections and token) for every download in that process.
+    The client is thread-safe, so pool threads share it.
+    """
+    client = storage.Client()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    client._http.mount("https://", adapter)
+    return client
 
 
 def parse_gs(uri: str) -> Tuple[str, str]:
@@ -50,12 +72,145 @@ def parse_gs(uri: str) -> Tuple[str, str]:
 
 def download_blob_to(uri: str, local: Path):
     b, p = parse_gs(uri)
-    STORAGE.bucket(b).blob(p).download_to_filename(str(local))
+    _client().bucket(b).blob(p).download_to_filename(str(local))
+
+
+# Blobs larger than this are fetched as concurrent range reads instead of one stream.
+CHUNKED_DOWNLOAD_THRESHOLD = 32 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def download_blob_bytes(uri: str) -> bytes:
+    b, p = parse_gs(uri)
+    bucket = _client().bucket(b)
+    # No separate metadata request: the first CHUNKED_DOWNLOAD_THRESHOLD bytes are read
+    # directly, and anything shorter than that is the whole object.
+    head_blob = bucket.blob(p)
+    try:
+        head = head_blob.download_as_bytes(start=0, end=CHUNKED_DOWNLOAD_THRESHOLD - 1)
+    except NotFound:
+        raise FileNotFoundError(f"{uri} not found")
+    except RequestRangeNotSatisfiable:
+        return b""  # empty object
+    if len(head) < CHUNKED_DOWNLOAD_THRESHOLD:
+        return head
+
+    # Large blob: pin the generation the first range came from (set from its response
+    # headers), look up that generation's size, and fetch the rest in parallel ranges.
+    generation = head_blob.generation
+    sized = bucket.blob(p, generation=generation)
+    sized.reload(fields="size")
+    size = sized.size
+    buf = bytearray(size)
+    buf[:len(head)] = head
+
+    def fetch(start: int) -> None:
+        end = min(start + DOWNLOAD_CHUNK_SIZE, size) - 1
+        part = bucket.blob(p, generation=generation)
+        buf[start:end + 1] = part.download_as_bytes(start=start, end=end, checksum=None)
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_CHUNK_WORKERS) as ex:
+        list(ex.map(fetch, range(len(head), size, DOWNLOAD_CHUNK_SIZE)))
+    return bytes(buf)
 
 
 # -----------------------------------------------------------------------------
 # Worker
 # -----------------------------------------------------------------------------
+# Per-thread scratch arrays and resampler streams, grown to the longest track seen so
+# far and reused so each file does not allocate fresh multi-megabyte PCM buffers.
+_SCRATCH = threading.local()
+# Largest buffer a thread keeps: 16 MiB of float32 (~47 s of 44.1kHz stereo), so 64
+# threads pin at most ~2 GiB across both buffers. Longer tracks get a one-off array
+# that is freed with the track instead of being kept for the life of the process.
+SCRATCH_KEEP_SAMPLES = 4 * 1024 * 1024
+
+
+def _scratch(name: str, needed: int) -> np.ndarray:
+    if needed > SCRATCH_KEEP_SAMPLES:
+        return np.empty(needed, dtype=np.float32)
+    buf = getattr(_SCRATCH, name, None)
+    if buf is None or buf.size < needed:
+        buf = np.empty(needed, dtype=np.float32)
+        setattr(_SCRATCH, name, buf)
+    return buf[:needed]
+
+
+def _resampler(in_rate: int, out_rate: int) -> soxr.ResampleStream:
+    # The stream is this thread's resampler specialised to one fixed (in, out) ratio:
+    # soxr designs the polyphase filter bank when it is created, so keeping it per
+    # ratio means the design cost is paid once per thread and every later file only
+    # runs soxr's SIMD convolution kernel.
+    streams = getattr(_SCRATCH, "streams", None)
+    if streams is None:
+        streams = _SCRATCH.streams = {}
+    stream = streams.get((in_rate, out_rate))
+    if stream is None:
+        stream = soxr.ResampleStream(in_rate, out_rate, 1, dtype="float32", quality="HQ")
+        streams[(in_rate, out_rate)] = stream
+    else:
+        stream.clear()
+    return stream
+
+
+def output_path_for(vocals_uri: str, output_dir: str, gs_file_uri_in_csv: bool) -> Tuple[str, Path]:
+    """Return (track_name, output_dir/<track_name>.wav) for a source URI."""
+    if gs_file_uri_in_csv:
+        track_name = os.path.basename(os.path.dirname(vocals_uri))
+    else:
+        track_filename = Path(vocals_uri).name
+        track_name = os.path.splitext(str(track_filename))[0]
+    return track_name, Path(output_dir) / f"{track_name}.wav"
+
+
+def resample_to_wav(raw: bytes, out_path: Path, target_sample_rate: int, track_name: str) -> None:
+    """
+    - Decodes the downloaded bytes
+    - Resamples to target sample rate and converts to mono
+    - Saves to out_path
+    """
+    buf = io.BytesIO(raw)
+    try:
+        # Already a 16-bit mono WAV at the target rate: keep the downloaded bytes as-is
+        info = sf.info(buf)
+        buf.seek(0)
+        if (info.samplerate == target_sample_rate and info.channels == 1
+                and info.format == "WAV" and info.subtype == "PCM_16"):
+            with open(out_path, "wb") as f:
+                f.write(raw)
+            logger.info(f"[{track_name}] already {target_sample_rate}Hz mono, saved to {out_path}")
+            return
+        
+        with sf.SoundFile(buf) as snd:
+            frames, channels, sr = snd.frames, snd.channels, snd.samplerate
+            data = _scratch("pcm", frames * channels).reshape(frames, channels)
+            # Decoders may deliver fewer frames than the header promised (mp3/ogg, truncated
+            # files); read returns only the filled rows, the rest is the last track's samples
+            data = snd.read(dtype="float32", always_2d=True, out=data)
+            frames = len(data)
+        
+        # Convert to mono if stereo: one vectorised float32 reduction across channels
+        if channels > 1:
+            mono = np.mean(data, axis=1, dtype=np.float32, out=_scratch("mono", frames))
+        else:
+            mono = data[:, 0]
+        
+        # Resample if needed (libsoxr, reusing this thread's stream state)
+        if sr != target_sample_rate:
+            mono = _resampler(sr, target_sample_rate).resample_chunk(mono, last=True)
+        
+        # 3️⃣ export (the only disk write for this track)
+        with sf.SoundFile(
+            str(out_path), "w", samplerate=target_sample_rate, channels=1, subtype="PCM_16"
+        ) as out:
+            out.write(mono)
+        logger.info(f"[{track_name}] downloaded resampled to {target_sample_rate}Hz mono, and saved to {out_path}")
+
+    except Exception as e:
+        logger.error(f"[{track_name}] processing failed: {e}")
+        return
+
+
 def download_and_resample(
     vocals_uri: str,
     output_dir: str,
@@ -63,53 +218,84 @@ def download_and_resample(
     gs_file_uri_in_csv: bool = False,
 ) -> None:
     """
-    - Downloads `vocals_uri` into a temp dir
+    - Downloads `vocals_uri` into memory
     - Resamples to target sample rate and converts to mono
     - Saves to output_dir/<track_name>.wav
     """
-    
-    if gs_file_uri_in_csv:
-        track_name = os.path.basename(os.path.dirname(vocals_uri))
-    else:
-        track_filename = Path(vocals_uri).name
-        track_name = os.path.splitext(str(track_filename))[0]
-    out_path = Path(output_dir) / f"{track_name}.wav"
+    track_name, out_path = output_path_for(vocals_uri, output_dir, gs_file_uri_in_csv)
     
     # Skip if already processed
     if out_path.exists():
         logger.info(f"[{track_name}] already exists, skipping")
         return
     
-    with tempfile.TemporaryDirectory() as td:
-        td = Path(td)
-        wav_path = td / f"{track_name}.wav"
+    # 1️⃣ download
+    try:
+        raw = download_blob_bytes(vocals_uri)
+    except Exception as e:
+        logger.error(f"[{track_name}] download failed: {e}")
+        return
 
-        # 1️⃣ download
-        try:
-            download_blob_to(vocals_uri, wav_path)
-        except Exception as e:
-            logger.error(f"[{track_name}] download failed: {e}")
-            return
+    # 2️⃣ load & resample
+    resample_to_wav(raw, out_path, target_sample_rate, track_name)
 
-        # 2️⃣ load & resample
-        try:
-            audio = AudioSegment.from_wav(str(wav_path))
-            
-            # Convert to mono if stereo
-            if audio.channels > 1:
-                audio = audio.set_channels(1)
-            
-            # Resample if needed
-            if audio.frame_rate != target_sample_rate:
-                audio = audio.set_frame_rate(target_sample_rate)
-            
-            # 3️⃣ export
-            audio.export(str(out_path), format="wav")
-            logger.info(f"[{track_name}] downloaded resampled to {target_sample_rate}Hz mono, and saved to {out_path}")
 
-        except Exception as e:
-            logger.error(f"[{track_name}] processing failed: {e}")
-            return
+def download_then_resample_in_processes(
+    uris: List[str],
+    output_dir: str,
+    target_sample_rate: int,
+    gs_file_uri_in_csv: bool,
+) -> None:
+    """
+    Download on threads in this process (sharing one storage client) and hand each
+    downloaded track to a process pool for decoding and resampling, so network
+    waits overlap CPU work. A semaphore bounds how many downloaded tracks can wait
+    in memory for a free process.
+    """
+    num_workers = multiprocessing.cpu_count()
+    num_download_threads = min(32, num_workers * 4)
+    in_flight = threading.BoundedSemaphore(num_workers * 2)
+    logger.info(f"Using {num_download_threads} download threads and {num_workers} resampling processes")
+
+    # Workers are started lazily by the first submit, which comes from a download thread while
+    # the others hold requests/SSL/logging locks; forking then could deadlock a worker, so
+    # they come from a clean forkserver process instead (as in desilence_split.py).
+    ctx = multiprocessing.get_context("forkserver")
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx) as cpu_pool:
+        def fetch(uri: str):
+            track_name, out_path = output_path_for(uri, output_dir, gs_file_uri_in_csv)
+            if out_path.exists():
+                logger.info(f"[{track_name}] already exists, skipping")
+                return None
+            in_flight.acquire()
+            try:
+                raw = download_blob_bytes(uri)
+            except Exception as e:
+                in_flight.release()
+                logger.error(f"[{track_name}] download failed: {e}")
+                return None
+            try:
+                future = cpu_pool.submit(resample_to_wav, raw, out_path, target_sample_rate, track_name)
+            except Exception:
+                in_flight.release()  # e.g. BrokenProcessPool: the slot would otherwise leak
+                raise
+            future.add_done_callback(lambda _: in_flight.release())
+            return future
+
+        with ThreadPoolExecutor(max_workers=num_download_threads) as io_pool:
+            pending = [
+                f for f in tqdm(
+                    io_pool.map(fetch, uris),
+                    total=len(uris),
+                    desc="Downloading",
+                    miniters=max(1, len(uris) // 500),
+                    mininterval=0.5,
+                    smoothing=0.05,
+                )
+                if f is not None
+            ]
+        for future in tqdm(pending, desc="Resampling", miniters=max(1, len(pending) // 500), mininterval=0.5):
+            future.result()
 
 
 # -----------------------------------------------------------------------------
@@ -123,6 +309,7 @@ def main(
     target_sample_rate: int = 16000,
     gs_file_uri_in_csv: bool = False,
     parallel: bool = True,
+    use_processes: bool = False,
 ):
     # Expand ~ to home directory
     local_datasets_dir = os.path.expanduser(local_datasets_dir)
@@ -143,21 +330,23 @@ def main(
             logger.error(f"Failed to download CSV: {e}")
             return
         
-        # load URIs
-        uris = []
-        with open(local_csv, newline="", encoding="utf-8") as f:
-            rdr = csv.DictReader(f)
-            if uri_name_header not in rdr.fieldnames:
-                logger.error(f"CSV missing '{uri_name_header}' column")
-                return
-            for row in rdr:
-                if gs_file_uri_in_csv:
-                    ds_uri = row[uri_name_header].strip()
-                else:
-                    track_name = os.path.basename(row[uri_name_header].strip())
-                    ds_uri = "gs://" + os.path.join(ds_gs_prefix, track_name)
-                if ds_uri:
-                    uris.append(ds_uri)
+        # load URIs (only the URI column, parsed by pandas' C reader)
+        header = pd.read_csv(local_csv, nrows=0).columns
+        if uri_name_header not in header:
+            logger.error(f"CSV missing '{uri_name_header}' column")
+            return
+        uris_series = pd.read_csv(
+            local_csv,
+            usecols=[uri_name_header],
+            engine="c",
+            dtype=str,
+            keep_default_na=False,
+        )[uri_name_header].str.strip()
+        if gs_file_uri_in_csv:
+            uris = [uri for uri in uris_series.tolist() if uri]
+        else:
+            track_names = uris_series.str.rsplit("/", n=1).str[-1]
+            uris = ("gs://" + ds_gs_prefix.rstrip("/") + "/" + track_names).tolist()
 
         csv_copy_path = os.path.join(dataset_path, "original_gs_input.csv")
         shutil.copy(local_csv, csv_copy_path)
@@ -165,24 +354,30 @@ def main(
 
     logger.info(f"{len(uris)} URIs to process")
 
-    if parallel:
-        # use all CPU cores
-        num_workers = multiprocessing.cpu_count()
-        logger.info(f"Using {num_workers} parallel processes")
-
-        # process in a pool
-        with ProcessPoolExecutor(max_workers=num_workers) as exe:
-            futures = {
-                exe.submit(
-                    download_and_resample,
-                    uri,
-                    str(audio_dir),
-                    target_sample_rate,
-                    gs_file_uri_in_csv,
-                ): uri
-                for uri in uris
-            }
-            for _ in tqdm(as_completed(futures), total=len(futures), desc="Downloading"):
+    if parallel and use_processes:
+        # for hosts where decoding rather than GCS I/O dominates
+        download_then_resample_in_processes(uris, str(audio_dir), target_sample_rate, gs_file_uri_in_csv)
+    elif parallel:
+        # GCS I/O and libsndfile/libsoxr release the GIL, so threads overlap network stalls
+        # without per-process startup cost and share the process's storage client
+        num_workers = min(MAX_DOWNLOAD_THREADS, multiprocessing.cpu_count() * 4)
+        logger.info(f"Using {num_workers} parallel threads")
+
+        worker = partial(
+            download_and_resample,
+            output_dir=str(audio_dir),
+            target_sample_rate=target_sample_rate,
+            gs_file_uri_in_csv=gs_file_uri_in_csv,
+        )
+        with ThreadPoolExecutor(max_workers=num_workers) as exe:
+            for _ in tqdm(
+                exe.map(worker, uris),
+                total=len(uris),
+                desc="Downloading",
+                miniters=max(1, len(uris) // 500),
+                mininterval=0.5,
+                smoothing=0.05,
+            ):
                 pass
     else:
         # sequential processing
@@ -222,6 +417,11 @@ if __name__ == "__main__":
         default=False,
         help="Disable parallel processing (process files sequentially)"
     )
+    p.add_argument(
+        "--use_processes", action="store_true",
+        default=False,
+        help="Download on threads but decode/resample in a process pool (one worker per core)"
+    )
     args = p.parse_args()
 
     main(
@@ -232,5 +432,6 @@ if __name__ == "__main__":
         target_sample_rate=args.target_sample_rate,
         gs_file_uri_in_csv=args.gs_file_uri_in_csv,
         parallel=not args.no_parallel,
+        use_processes=args.use_processes,
     )
 
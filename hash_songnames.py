@@ -7,103 +7,137 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
 
+_md5 = hashlib.md5
+
+
 def hash_name(name: str) -> str:
     """
     Generate an MD5 hash of the given name.
+    The hash is only a stable directory name, so skip the FIPS/security path.
+    Stays MD5 so folder names match trackname_to_md5name_mapping.csv from earlier runs.
     """
-    return hashlib.md5(name.encode("utf-8")).hexdigest()
+    return _md5(name.encode("utf-8"), usedforsecurity=False).hexdigest()
+
+
+def _exists_at(name: str, dir_fd: int) -> bool:
+    try:
+        os.stat(name, dir_fd=dir_fd)
+        return True
+    except FileNotFoundError:
+        return False
 
 
-def rename_folder(args_tuple: tuple) -> dict:
+def rename_folder(first_path: str, second: str, new_name: str, dir_fd: int) -> tuple:
     """
-    Rename a single folder to its hash.
-    Returns a dict with 'original' and 'new' paths, or None if failed.
+    Rename a single folder to its precomputed hash `new_name`.
+    `dir_fd` is an open descriptor for `first_path`, so the rename and collision
+    checks work on leaf names and the kernel resolves the parent only once.
+    Returns an (original, new) path tuple, or None if failed.
     """
-    first_path, second = args_tuple
-    second_path = os.path.join(first_path, second)
-    
-    if not os.path.isdir(second_path):
-        return None
-    
-    # Compute hash
-    new_name = hash_name(second)
-    new_path = os.path.join(first_path, new_name)
-    
     # Handle potential name collisions
-    if os.path.exists(new_path):
+    if _exists_at(new_name, dir_fd):
         suffix = 1
-        while os.path.exists(new_path + f"_{suffix}"):
+        while _exists_at(f"{new_name}_{suffix}", dir_fd):
             suffix += 1
-        new_path = new_path + f"_{suffix}"
         new_name = f"{new_name}_{suffix}"
     
     try:
-        os.rename(second_path, new_path)
-        return {"original": second_path, "new": new_path}
+        os.rename(second, new_name, src_dir_fd=dir_fd, dst_dir_fd=dir_fd)
+        return (os.path.join(first_path, second), os.path.join(first_path, new_name))
     except Exception as e:
-        print(f"Error renaming {second_path}: {e}")
+        print(f"Error renaming {os.path.join(first_path, second)}: {e}")
         return None
 
 
+def rename_group(first_path: str, seconds: list) -> list:
+    """
+    Rename all song folders under one first-level directory, opening it once.
+    `seconds` holds (folder name, hashed name) pairs.
+    Returns the list of (original, new) path tuples that succeeded.
+    """
+    try:
+        dir_fd = os.open(first_path, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError as e:
+        print(f"Error opening {first_path}: {e}")
+        return []
+    try:
+        results = (rename_folder(first_path, second, new_name, dir_fd) for second, new_name in seconds)
+        return [r for r in results if r]
+    finally:
+        os.close(dir_fd)
+
+
 def process_second_level_folders(base_dir: str, csv_path: str, parallel: bool = True) -> None:
     """
     For each second-level subfolder under base_dir (i.e., base_dir/*/*),
     compute a hash of its folder name, rename the folder to the hash,
     and record the mapping (original path -> new path) in a CSV.
     """
-    # Collect all work items first
-    work_items = []
+    # Collect all work items first, keyed by parent so each first-level directory is opened once
+    work_items = {}
     
-    first_level_dirs = [
-        os.path.join(base_dir, first)
-        for first in os.listdir(base_dir)
-        if os.path.isdir(os.path.join(base_dir, first))
-    ]
+    # os.scandir answers is_dir() from the directory listing itself, so no extra stat per entry
+    with os.scandir(base_dir) as it:
+        first_level_dirs = [first.path for first in it if first.is_dir(follow_symlinks=False)]
     print(f"Found {len(first_level_dirs)} first-level directories")
     
     # Collect all second-level directories
     print("Collecting second-level directories...")
     for first_path in tqdm(first_level_dirs, desc="Scanning directories"):
         try:
-            for second in os.listdir(first_path):
-                second_path = os.path.join(first_path, second)
-                if os.path.isdir(second_path):
-                    work_items.append((first_path, second))
+            with os.scandir(first_path) as it:
+                children = [second.name for second in it if second.is_dir(follow_symlinks=False)]
+            if children:
+                work_items[first_path] = children
         except Exception as e:
             print(f"Error scanning {first_path}: {e}")
     
-    print(f"Found {len(work_items)} song directories to rename")
+    total = sum(len(children) for children in work_items.values())
+    print(f"Found {total} song directories to rename")
+    
+    # Hash every name up front in this thread, so the pool workers only do renames.
+    # A digest of a short name is well under a microsecond in C; map() keeps the
+    # per-name Python overhead to one call.
+    groups = {
+        first_path: list(zip(children, map(hash_name, children)))
+        for first_path, children in work_items.items()
+    }
     
     mappings = []
     
     if parallel:
         # Parallel processing with ThreadPoolExecutor (I/O bound)
-        num_workers = min(32, multiprocessing.cpu_count() * 2)
+        # Parallelism comes across parents; there is no point in more workers than groups
+        num_workers = max(1, min(32, multiprocessing.cpu_count() * 2, len(groups)))
         print(f"Processing with {num_workers} parallel workers...")
         
         with ThreadPoolExecutor(max_workers=num_workers) as executor:
-            futures = {executor.submit(rename_folder, item): item for item in work_items}
+            futures = {
+                executor.submit(rename_group, first_path, seconds): len(seconds)
+                for first_path, seconds in groups.items()
+            }
             
-            for future in tqdm(as_completed(futures), total=len(futures), desc="Renaming directories"):
-                result = future.result()
-                if result:
-                    mappings.append(result)
+            with tqdm(total=total, desc="Renaming directories",
+                      miniters=max(1, total // 500), mininterval=0.5) as pbar:
+                for future in as_completed(futures):
+                    mappings.extend(future.result())
+                    pbar.update(futures[future])
     else:
         # Sequential processing
         print("Processing sequentially...")
-        for item in tqdm(work_items, desc="Renaming directories"):
-            result = rename_folder(item)
-            if result:
-                mappings.append(result)
+        with tqdm(total=total, desc="Renaming directories",
+                  miniters=max(1, total // 500), mininterval=0.5) as pbar:
+            for first_path, seconds in groups.items():
+                mappings.extend(rename_group(first_path, seconds))
+                pbar.update(len(seconds))
     
     print(f"Renamed {len(mappings)} song directories")
 
     # Write mapping CSV
-    with open(csv_path, mode="w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=["original", "new"])
-        writer.writeheader()
-        for row in mappings:
-            writer.writerow(row)
+    with open(csv_path, mode="w", newline="", encoding="utf-8", buffering=1 << 20) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(("original", "new"))
+        writer.writerows(mappings)
 
 
 def main():
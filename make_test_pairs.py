@@ -7,13 +7,14 @@ For each singer in the test set:
 
 # imports
 import os
+import csv
 import json
 import random
 import itertools
-import pandas as pd
 import argparse
 from pathlib import Path
 import glob
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
 # Parse command-line arguments
@@ -62,37 +63,44 @@ args = parser.parse_args()
 random.seed(args.seed)
 
 # Load CSV file
+# Filter for test set in a single streaming pass (only two columns are needed)
+# Handle both string values and numeric values
+# Numeric mapping: 0=train, 1=test (validation), 2=exp (test set)
+# String mapping: 'train'=train, 'test'=validation, 'exp'=test set
+TEST_SPLIT_VALUES = {'test', 'exp', '1', '2', '1.0', '2.0'}
+
 print(f"Loading CSV from {args.csv_path}")
+# Build mapping from singer_id to the song names in the test set
+# The song_name in directory might match local_file_name or be derived from it
+csv_singer_song_map = {}
+total_rows = 0
+test_rows = 0
+all_split_values = set()
+test_split_values = set()
 try:
-    df = pd.read_csv(args.csv_path)
-    print(f"Loaded CSV with {len(df)} rows")
+    with open(args.csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            total_rows += 1
+            split_value = row[args.split_header]
+            s = split_value.strip().lower()
+            all_split_values.add(split_value)
+            if s in TEST_SPLIT_VALUES:
+                test_rows += 1
+                test_split_values.add(split_value)
+                csv_singer_song_map.setdefault(str(row[args.singer_id_header]), set()).add(
+                    str(row[args.file_name_header])
+                )
+    print(f"Loaded CSV with {total_rows} rows")
 except Exception as e:
     print(f"Error loading CSV: {e}")
     exit(1)
 
-# Filter for test set
-# Handle both string values and numeric values
-# Numeric mapping: 0=train, 1=test (validation), 2=exp (test set)
-# String mapping: 'train'=train, 'test'=validation, 'exp'=test set
-split_col = df[args.split_header]
-
-# Convert to string for comparison, handling both numeric and string values
-split_values_str = split_col.astype(str).str.lower().str.strip()
-split_values_num = pd.to_numeric(split_col, errors='coerce')
-
-# Check for test set: numeric 1 (validation/test) or 2 (exp/test), or string 'test' or 'exp'
-test_mask = (
-    split_values_num.isin([1, 2]) |  # Numeric: 1=test/validation, 2=exp/test
-    split_values_str.isin(['test', 'exp', '1', '2'])  # String values
-)
-test_df = df[test_mask].copy()
-
-print(f"Found {len(test_df)} rows in test set")
-if len(test_df) > 0:
-    print(f"Unique split values in test set: {test_df[args.split_header].unique()}")
+print(f"Found {test_rows} rows in test set")
+if test_rows > 0:
+    print(f"Unique split values in test set: {sorted(test_split_values)}")
 else:
     print("Warning: No test rows found. Check the split column values.")
-    print(f"Available split values in dataset: {df[args.split_header].unique()}")
+    print(f"Available split values in dataset: {sorted(all_split_values)}")
 
 # Get test directory path
 test_wav_dir = Path(args.test_dir)
@@ -100,50 +108,45 @@ if not test_wav_dir.exists():
     print(f"Error: Test directory does not exist: {test_wav_dir}")
     exit(1)
 
-# Build mapping from (singer_id, song_name) to CSV row for reference
-# The song_name in directory might match local_file_name or be derived from it
-csv_singer_song_map = {}
-for _, row in tqdm(test_df.iterrows(), total=len(test_df), desc="Building singer-song mapping"):
-    singer_id = str(row[args.singer_id_header])
-    file_name = str(row[args.file_name_header])
-    # Store mapping - we'll use this to match directory structure
-    if singer_id not in csv_singer_song_map:
-        csv_singer_song_map[singer_id] = set()
-    csv_singer_song_map[singer_id].add(file_name)
-
 # Walk the test directory to find all audio files
 print(f"Scanning test directory: {test_wav_dir}")
-all_wav_files = []
+all_wav_files = []  # (singer_id, rel_path) tuples
 test_singers = {}  # Dictionary to store test singers and their files
 
 # Expected structure: test_dir/{singer_id}/{song_name}/{audio_chunks.wav}
-singer_dirs = [d for d in test_wav_dir.iterdir() if d.is_dir()]
-for singer_dir in tqdm(singer_dirs, desc="Scanning singer directories"):
+def list_singer(singer_dir):
+    """Return (singer_id, [relative wav paths]) for one singer directory."""
     singer_id = singer_dir.name
-    
+    rel_paths = []
+    # scandir gives the entry type without a stat per entry
+    with os.scandir(singer_dir.path) as songs:
+        song_dirs = [e for e in songs if e.is_dir(follow_symlinks=False)]
+    for song_dir in song_dirs:
+        with os.scandir(song_dir.path) as chunks:
+            for entry in chunks:
+                if entry.name.endswith(".wav") and entry.is_file():
+                    # Relative path: {singer_id}/{song_name}/{filename.wav}
+                    rel_paths.append(os.path.join(singer_id, song_dir.name, entry.name))
+    return singer_id, rel_paths
+
+
+with os.scandir(test_wav_dir) as it:
     # Only process singers that are in the test CSV
-    if singer_id not in csv_singer_song_map:
-        continue
-    
-    # Walk through song directories
-    for song_dir in singer_dir.iterdir():
-        if not song_dir.is_dir():
+    singer_dirs = [
+        e for e in it
+        if e.is_dir(follow_symlinks=False) and e.name in csv_singer_song_map
+    ]
+
+# Directory listing is I/O bound, so overlap it across threads
+with ThreadPoolExecutor(max_workers=32) as executor:
+    for singer_id, rel_paths in tqdm(executor.map(list_singer, singer_dirs),
+                                     total=len(singer_dirs),
+                                     desc="Scanning singer directories"):
+        if not rel_paths:
             continue
-        
-        song_name = song_dir.name
-        
-        # Find all WAV files in this song directory
-        wav_files = list(song_dir.glob("*.wav"))
-        
-        for wav_file in wav_files:
-            # Create relative path: {singer_id}/{song_name}/{filename.wav}
-            rel_path = os.path.relpath(wav_file, start=test_wav_dir)
-            all_wav_files.append(rel_path)
-            
-            # Add to the test_singers dictionary
-            if singer_id not in test_singers:
-                test_singers[singer_id] = []
-            test_singers[singer_id].append(rel_path)
+        all_wav_files.extend((singer_id, rel) for rel in rel_paths)
+        # Add to the test_singers dictionary
+        test_singers[singer_id] = rel_paths
 
 print(f"Total test wav files found: {len(all_wav_files)}")
 print(f"Test singers found: {len(test_singers)}")
@@ -153,20 +156,28 @@ print(f"Test singers found: {len(test_singers)}")
 all_pairs = []
 used_pairs = set()  # Track all pairs to ensure no duplicates
 
+# Negatives are drawn by picking another singer, then one of their files, so no
+# per-singer scan over every file is needed. Give up after this many collisions.
+MAX_NEGATIVE_ATTEMPTS = 100
+singer_ids = list(test_singers)
+
+
+def pair_key_of(a: str, b: str) -> tuple:
+    """Order-independent key for a pair of files."""
+    return (a, b) if a < b else (b, a)
+
+
 # For each singer in the test set
 for singer_id, singer_files in tqdm(test_singers.items(), desc="Creating pairs for singers"):
-    # Make all combinations of 2 files from this singer
-    same_singer_pairs = list(itertools.combinations(singer_files, 2))
+    has_other_singers = len(singer_ids) > 1
+    if not has_other_singers:
+        print(f"  Warning: No files found from other singers")
     
-    # Get files not from this singer - do this once per singer
-    # Extract singer_id from path (first part of the path)
-    other_singers_files = [f for f in all_wav_files if not f.startswith(f"{singer_id}/")]
-    random.shuffle(other_singers_files)  # Shuffle to ensure random selection
-    
-    # For each positive pair, create a corresponding negative pair
-    for i, (file1, file2) in enumerate(same_singer_pairs):
+    # For each positive pair (all combinations of 2 files from this singer),
+    # create a corresponding negative pair
+    for file1, file2 in itertools.combinations(singer_files, 2):
         # Create a unique key for this pair to check for duplicates
-        pair_key = tuple(sorted([file1, file2]))
+        pair_key = pair_key_of(file1, file2)
         if pair_key in used_pairs:
             print(f"  Skipping duplicate positive pair: {file1}, {file2}")
             continue
@@ -175,36 +186,23 @@ for singer_id, singer_files in tqdm(test_singers.items(), desc="Creating pairs f
         all_pairs.append((1, file1, file2))
         used_pairs.add(pair_key)
         
+        if not has_other_singers:
+            continue
+        
         # Find a file from a different singer for a negative pair
-        if other_singers_files:
-            # Take the next file from the shuffled list
-            negative_idx = i % len(other_singers_files)
-            random_file = other_singers_files[negative_idx]
-            
-            # Create a unique key for this negative pair
-            neg_pair_key1 = tuple(sorted([file1, random_file]))
-            neg_pair_key2 = tuple(sorted([file2, random_file]))
-            
-            # Check if this negative pair already exists
-            if neg_pair_key1 not in used_pairs and neg_pair_key2 not in used_pairs:
+        for _ in range(MAX_NEGATIVE_ATTEMPTS):
+            other_singer = random.choice(singer_ids)
+            if other_singer == singer_id:
+                continue
+            random_file = random.choice(test_singers[other_singer])
+            neg_pair_key = pair_key_of(file1, random_file)
+            if neg_pair_key not in used_pairs:
                 # Add the negative pair (label 0)
                 all_pairs.append((0, file1, random_file))
-                used_pairs.add(neg_pair_key1)
-            else:
-                # Try to find another file that hasn't been used
-                found_unused = False
-                for alt_file in other_singers_files:
-                    alt_pair_key = tuple(sorted([file1, alt_file]))
-                    if alt_pair_key not in used_pairs:
-                        all_pairs.append((0, file1, alt_file))
-                        used_pairs.add(alt_pair_key)
-                        found_unused = True
-                        break
-                
-                if not found_unused:
-                    print(f"  Warning: Could not find unused pair for {file1}")
+                used_pairs.add(neg_pair_key)
+                break
         else:
-            print(f"  Warning: No files found from other singers")
+            print(f"  Warning: Could not find unused pair for {file1}")
 
 # Final check for duplicate pairs
 unique_pairs = set()
@@ -215,7 +213,7 @@ for label, file1, file2 in all_pairs:
     # Normalize the pair by sorting
     if label == 1:
         # For positive pairs, order doesn't matter
-        pair_key = (label, tuple(sorted([file1, file2])))
+        pair_key = (label, pair_key_of(file1, file2))
     else:
         # For negative pairs, first file is from test set, second is from other singers
         pair_key = (label, file1, file2)
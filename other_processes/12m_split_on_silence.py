@@ -10,13 +10,18 @@ import csv
 import logging
 import os
 import multiprocessing
+import multiprocessing.util
 import shutil
 import subprocess
 import tempfile
+import threading
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
+import soundfile as sf
+import soxr
 from google.cloud import storage
 from google.oauth2.credentials import Credentials
 from pydub import AudioSegment
@@ -48,7 +53,16 @@ def make_storage_client():
     return storage.Client()
 
 
-STORAGE = make_storage_client()
+# One client per worker thread, created on first use rather than at import time,
+# so tasks never share (or inherit across fork) a client built in another context.
+_tls = threading.local()
+
+
+def _storage() -> storage.Client:
+    client = getattr(_tls, "client", None)
+    if client is None:
+        client = _tls.client = make_storage_client()
+    return client
 
 
 def parse_gs(uri: str) -> Tuple[str, str]:
@@ -60,17 +74,44 @@ def parse_gs(uri: str) -> Tuple[str, str]:
 
 def download_blob_to(uri: str, local: Path):
     b, p = parse_gs(uri)
-    STORAGE.bucket(b).blob(p).download_to_filename(str(local))
+    _storage().bucket(b).blob(p).download_to_filename(str(local))
 
 
 def upload_blob_from(local: Path, uri: str):
     b, p = parse_gs(uri)
-    STORAGE.bucket(b).blob(p).upload_from_filename(str(local))
+    _storage().bucket(b).blob(p).upload_from_filename(str(local))
 
 
 # -----------------------------------------------------------------------------
 # Worker
 # -----------------------------------------------------------------------------
+def export_mono(seg: AudioSegment, path: str, target_sample_rate: int) -> None:
+    """Downmix a segment to mono, resample it with libsoxr and write 16-bit PCM."""
+    full_scale = float(1 << (8 * seg.sample_width - 1))
+    samples = np.asarray(seg.get_array_of_samples(), dtype=np.float32) / full_scale
+    if seg.channels > 1:
+        samples = samples.reshape(-1, seg.channels).mean(axis=1, dtype=np.float32)
+    if seg.frame_rate != target_sample_rate:
+        samples = soxr.resample(samples, seg.frame_rate, target_sample_rate, quality="HQ")
+    sf.write(path, samples, target_sample_rate, subtype="PCM_16")
+
+
+# One scratch directory per worker process, reused by every task it runs and
+# removed when the process exits.
+_TMPDIR = None
+
+
+def _init_worker() -> None:
+    global _TMPDIR
+    if _TMPDIR is None:
+        _TMPDIR = tempfile.mkdtemp(prefix="split_on_silence_")
+        # Pool workers leave via os._exit, so atexit handlers never run there; multiprocessing
+        # finalizers do, both in workers and (for direct calls) in the main process
+        multiprocessing.util.Finalize(
+            None, shutil.rmtree, args=(_TMPDIR,), kwargs={"ignore_errors": True}, exitpriority=10
+        )
+
+
 def process_and_upload(
     vocals_uri: str,
     ds_audio_dir: str,
@@ -80,19 +121,18 @@ def process_and_upload(
     min_segment_len: int,
 ) -> None:
     """
-    - downloads `vocals_uri` into a temp dir
+    - downloads `vocals_uri` into the worker's temp dir
     - splits on silence
     - saves each valid segment locally to ds_audio_dir/<stem_id>/<#####.wav>
-    - cleans up temp
+    - removes the downloaded file
     """
     track_filename = (Path(vocals_uri).name)
     track_name = os.path.splitext(str(track_filename))[0]
     out_base = Path(ds_audio_dir) / track_name
     out_base.mkdir(parents=True, exist_ok=True)
-    with tempfile.TemporaryDirectory() as td:
-        td = Path(td)
-        wav_path = td / f"{track_name}.wav"
-
+    _init_worker()  # no-op inside the pool; sets up the temp dir for direct calls
+    wav_path = Path(_TMPDIR) / f"{track_name}.wav"
+    try:
         # 1️⃣ download
         try:
             download_blob_to(vocals_uri, wav_path)
@@ -115,19 +155,16 @@ def process_and_upload(
         target_sample_rate = 16000  # 16kHz
         for idx, seg in enumerate(valid, start=1):
             fname = f"{idx:05d}.wav"
-            # Convert to mono if stereo (ensure single channel output)
-            if seg.channels > 1:
-                seg = seg.set_channels(1)
-            # Resample to 16kHz if needed
-            if seg.frame_rate != target_sample_rate:
-                seg = seg.set_frame_rate(target_sample_rate)
-            seg.export(str(out_base / fname), format="wav")
+            # Mono, 16kHz (libsoxr instead of pydub's audioop-based rate conversion)
+            export_mono(seg, str(out_base / fname), target_sample_rate)
             # local_seg = td / fname
             # gs_target = segments_gs_prefix.rstrip("/") + f"/{track_name}/{fname}"
             # try:
             #     upload_blob_from(local_seg, gs_target)
             # except Exception as e:
             #     logger.error(f"[{track_name}] upload {fname} failed: {e}")
+    finally:
+        wav_path.unlink(missing_ok=True)
 
 
 # -----------------------------------------------------------------------------
@@ -188,7 +225,7 @@ def main(
 
     # process_and_upload(uris[0], str(ds_audio_dir), min_silence_len, silence_thresh, keep_silence, min_segment_len)
     # process in a pool
-    with ProcessPoolExecutor(max_workers=num_workers) as exe:
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=_init_worker) as exe:
         futures = {
             exe.submit(
                 process_and_upload,
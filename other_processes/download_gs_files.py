@@ -9,6 +9,11 @@ import os
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+try:
+    import pandas as pd
+except ImportError:  # minimal-deps environments fall back to the csv module
+    pd = None
+
 # Configuration
 CSV_FILE = "/home/brendanoconnor/studio_results_20251209_2008.csv"
 OUTPUT_DIR = "/home/brendanoconnor/gs_imports/wildSVDD_partial_download"  # Note: using path as specified
@@ -41,19 +46,33 @@ def download_file(gs_url: str, output_dir: str) -> tuple[str, bool, str]:
         return (gs_url, False, str(e))
 
 
+def read_gs_urls(csv_file: str) -> list[str]:
+    """
+    Return the gs:// URLs from the 'url' column of the CSV.
+
+    Uses pandas' C parser on just that column when available, otherwise csv.DictReader.
+    """
+    if pd is not None:
+        urls = pd.read_csv(csv_file, usecols=['url'], dtype=str, encoding='utf-8')['url'].dropna().str.strip()
+        return urls[urls.str.startswith('gs://')].tolist()
+
+    urls = []
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            url = (row.get('url') or '').strip()
+            if url and url.startswith('gs://'):
+                urls.append(url)
+    return urls
+
+
 def main():
     # Create output directory if it doesn't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     print(f"Output directory: {OUTPUT_DIR}")
     
     # Read URLs from CSV
-    urls = []
-    with open(CSV_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            url = row.get('url', '').strip()
-            if url and url.startswith('gs://'):
-                urls.append(url)
+    urls = read_gs_urls(CSV_FILE)
     
     print(f"Found {len(urls)} GCS URLs to download")
     
@@ -7,9 +7,43 @@ now-empty subdirectory. Result: dataset root contains only <integer>.wav files.
 """
 import argparse
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
+def flatten_one(subdir: Path, root: Path, dry_run: bool, verbose: bool) -> tuple:
+    """
+    Move subdir/vocals.wav to root/<subdir>.wav and remove subdir.
+    Returns (status, message) where status is "moved", "skipped" or "error".
+    """
+    if not subdir.is_dir():
+        if verbose:
+            print(f"Skip (not dir): {subdir.name}")
+        return "skipped", None
+
+    vocals = subdir / "vocals.wav"
+    if not vocals.is_file():
+        return "error", f"Missing or not file: {vocals}"
+
+    dest = root / f"{subdir.name}.wav"
+    if dest.exists():
+        return "error", f"Destination already exists: {dest}"
+
+    if dry_run:
+        print(f"Would: mv {vocals} -> {dest}; rmdir {subdir}")
+        return "moved", None
+
+    try:
+        vocals.rename(dest)
+        if verbose:
+            print(f"mv {vocals} -> {dest}")
+        subdir.rmdir()
+        if verbose:
+            print(f"rmdir {subdir}")
+        return "moved", None
+    except OSError as e:
+        return "error", f"{vocals}: {e}"
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(
@@ -32,6 +66,13 @@ def main() -> None:
         action="store_true",
         help="Print each move and rmdir",
     )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=32,
+        help="Number of threads issuing moves in parallel (default: 32)",
+    )
     args = parser.parse_args()
 
     root = args.dataset_path.resolve()
@@ -42,38 +83,19 @@ def main() -> None:
     skipped = 0
     errors = []
 
-    for subdir in sorted(root.iterdir()):
-        if not subdir.is_dir():
-            if args.verbose:
-                print(f"Skip (not dir): {subdir.name}")
-            skipped += 1
-            continue
-
-        vocals = subdir / "vocals.wav"
-        if not vocals.is_file():
-            errors.append(f"Missing or not file: {vocals}")
-            continue
-
-        dest = root / f"{subdir.name}.wav"
-        if dest.exists():
-            errors.append(f"Destination already exists: {dest}")
-            continue
-
-        if args.dry_run:
-            print(f"Would: mv {vocals} -> {dest}; rmdir {subdir}")
-            moved += 1
-            continue
-
-        try:
-            vocals.rename(dest)
-            if args.verbose:
-                print(f"mv {vocals} -> {dest}")
-            subdir.rmdir()
-            if args.verbose:
-                print(f"rmdir {subdir}")
-            moved += 1
-        except OSError as e:
-            errors.append(f"{vocals}: {e}")
+    # Each move is a couple of metadata syscalls, so overlap them across threads
+    subdirs = sorted(root.iterdir())
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = executor.map(
+            lambda subdir: flatten_one(subdir, root, args.dry_run, args.verbose), subdirs
+        )
+        for status, message in results:
+            if status == "moved":
+                moved += 1
+            elif status == "skipped":
+                skipped += 1
+            else:
+                errors.append(message)
 
     if errors:
         for msg in errors:
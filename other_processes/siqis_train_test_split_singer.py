@@ -9,12 +9,16 @@ Can be used as an alternative to dataset_split.py when --siqi_split is provided.
 """
 
 import argparse
+import errno
 import json
-import random
+import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import time
+import numpy as np
 import pandas as pd
+from tqdm import tqdm
 
 
 def parse_args():
@@ -78,14 +82,80 @@ def parse_args():
         action="store_true",
         help="Copy files instead of moving them (default: move files)",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--no-parallel",
+        action="store_true",
+        help="Disable parallel processing (run sequentially)",
+    )
+    parser.add_argument(
+        "--output_format",
+        choices=["csv", "parquet", "both"],
+        default="csv",
+        help="Format of the updated split table: the input CSV in place (default), "
+             "a zstd Parquet file next to it (requires pyarrow), or both",
+    )
+    args = parser.parse_args()
+    # Parquet output needs pyarrow, which is not in requirements.txt: fail here, before any
+    # singer folder is moved, rather than after the split when the CSV may not be rewritten
+    if args.output_format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error(f"--output_format {args.output_format} requires pyarrow (pip install pyarrow)")
+    return args
+
+
+def copy_file(src, dst):
+    """
+    copytree copy function that copies in the kernel with os.copy_file_range, which
+    also shares extents (reflinks) on XFS/Btrfs. Falls back to shutil.copy2 where the
+    call is unavailable or unsupported for this pair of files.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+def count_wavs(directory) -> int:
+    """Count .wav files under directory, walking it with os.scandir (no Path objects or globbing)."""
+    count = 0
+    stack = [str(directory)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith(".wav"):
+                    count += 1
+    return count
+
+
+def list_subdirs(directory) -> set:
+    """Names of the subdirectories of directory (empty if it does not exist), from one scandir."""
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name for entry in it if entry.is_dir()}
+    except FileNotFoundError:
+        return set()
 
 
 def main():
     args = parse_args()
     
-    # Set random seed
-    random.seed(args.seed)
+    # Seeded generator for the test singer selection
+    rng = np.random.default_rng(args.seed)
     
     # Start timing
     start_time = time.time()
@@ -107,7 +177,9 @@ def main():
     
     # Load CSV (required, same as dataset_split.py)
     print("Loading dataframe...")
-    df = pd.read_csv(input_csv_path)
+    # Only the singer/artist columns are used and the rest are written back untouched,
+    # so read everything as text: no per-column type inference, values round-trip as-is
+    df = pd.read_csv(input_csv_path, dtype=str, engine="c")
     print(f"CSV loaded with {len(df)} rows")
     
     # Get unique singer IDs from CSV (same as dataset_split.py)
@@ -130,36 +202,46 @@ def main():
             print(f"Warning: Singer data JSON not found at {singer_data_path}")
     
     # Find singer directories in audio folder (for song counting and file moving)
-    # Exclude train/test/exp directories
+    # Exclude train/test/exp directories. One scandir pass keeps each entry's path.
     exclude_dirs = {'train', 'test', 'exp'}
-    singer_dirs_on_disk = set()
+    singer_dir_paths = {}
     if audio_dir.exists():
-        singer_dirs_on_disk = {
-            d.name for d in audio_dir.iterdir() 
-            if d.is_dir() and d.name not in exclude_dirs
-        }
+        with os.scandir(audio_dir) as it:
+            singer_dir_paths = {
+                entry.name: entry.path for entry in it
+                if entry.is_dir() and entry.name not in exclude_dirs
+            }
+    singer_dirs_on_disk = set(singer_dir_paths)
     print(f"Singer directories found on disk: {len(singer_dirs_on_disk)}")
     
     if total_singers == 0:
         print("Error: No singer IDs found in CSV")
         return 1
     
-    # Count songs per singer (from directory structure for priority logic)
-    singer_song_counts = {}
-    for singer_id in unique_singer_ids:
-        singer_path = audio_dir / singer_id
-        if singer_path.exists():
-            # Count subdirectories (songs) or wav files directly
-            song_dirs = [d for d in singer_path.iterdir() if d.is_dir()]
-            if song_dirs:
-                singer_song_counts[singer_id] = len(song_dirs)
-            else:
-                # Count wav files if no subdirectories
-                wav_files = list(singer_path.glob("*.wav"))
-                singer_song_counts[singer_id] = len(wav_files) if wav_files else 1
-        else:
-            # Singer in CSV but not on disk - count from CSV
-            singer_song_counts[singer_id] = len(df[df[args.singer_id_header] == singer_id])
+    def count_songs(singer_path):
+        """Count subdirectories (songs), or wav files directly if there are none."""
+        song_dirs = 0
+        wav_files = 0
+        with os.scandir(singer_path) as it:
+            for entry in it:
+                if entry.is_dir():
+                    song_dirs += 1
+                elif entry.name.endswith(".wav"):
+                    wav_files += 1
+        if song_dirs:
+            return song_dirs
+        return wav_files if wav_files else 1
+    
+    # Count songs per singer (from directory structure for priority logic).
+    # Singers in the CSV but not on disk are counted from the CSV, in one pass.
+    csv_song_counts = df[args.singer_id_header].value_counts().to_dict()
+    singer_song_counts = {
+        singer_id: (
+            count_songs(singer_dir_paths[singer_id]) if singer_id in singer_dir_paths
+            else csv_song_counts.get(singer_id, 0)
+        )
+        for singer_id in unique_singer_ids
+    }
     
     # Calculate target number of test singers
     ntest = int(total_singers * args.test_ratio)
@@ -174,30 +256,33 @@ def main():
     print(f"Singers with {args.min_songs}-{args.max_songs} songs: {len(singers_preferred)}")
     
     # Randomly select test singers, prioritizing those with preferred song counts
-    random.shuffle(singers_preferred)
-    test_singers = singers_preferred[:ntest]
+    test_singers = rng.choice(
+        np.asarray(singers_preferred, dtype=object),
+        size=min(ntest, len(singers_preferred)),
+        replace=False,
+    ).tolist()
     
     # If not enough preferred singers, select from remaining
     if len(test_singers) < ntest:
-        remaining_singers = [
-            s for s in unique_singer_ids 
-            if s not in test_singers and s not in singers_preferred
-        ]
-        random.shuffle(remaining_singers)
-        test_singers += remaining_singers[:ntest - len(test_singers)]
+        # Every preferred singer is already in test_singers at this point
+        preferred_set = frozenset(singers_preferred)
+        remaining_singers = [s for s in unique_singer_ids if s not in preferred_set]
+        test_singers += rng.choice(
+            np.asarray(remaining_singers, dtype=object),
+            size=min(ntest - len(test_singers), len(remaining_singers)),
+            replace=False,
+        ).tolist()
     
     # Train singers are all singers not in test set
-    train_singers = [s for s in unique_singer_ids if s not in test_singers]
+    test_set = frozenset(test_singers)
+    train_singers = [s for s in unique_singer_ids if s not in test_set]
     
     print(f"Final test set size: {len(test_singers)} singers")
     print(f"Final train set size: {len(train_singers)} singers")
     
     # Create split mapping
-    singer_split_map = {}
-    for singer_id in train_singers:
-        singer_split_map[singer_id] = 'train'
-    for singer_id in test_singers:
-        singer_split_map[singer_id] = 'test'
+    singer_split_map = dict.fromkeys(train_singers, 'train')
+    singer_split_map.update(dict.fromkeys(test_singers, 'test'))
     
     # Counters for statistics
     train_files_moved = 0
@@ -208,64 +293,99 @@ def main():
     operation_name = "Copying" if args.copy_files else "Moving"
     print(f"\n{operation_name} files to train/test directories...")
     
-    processed = 0
-    for singer_id in unique_singer_ids:
+    # Singers already placed in a split, indexed once so process_singer checks sets
+    # (source folders are already indexed in singer_dir_paths)
+    train_dirs_on_disk = list_subdirs(train_dir)
+    test_dirs_on_disk = list_subdirs(test_dir)
+    
+    # Helper function to process a single singer
+    def process_singer(singer_id):
+        """Move or copy one singer directory. Returns (is_train, wav_count, status)."""
         src_singer_dir = audio_dir / singer_id
         
         # Determine destination
-        if singer_id in train_singers:
+        is_train = singer_id not in test_set
+        if is_train:
             dest_singer_dir = train_dir / singer_id
         else:
             dest_singer_dir = test_dir / singer_id
         
         # Check if source directory exists and isn't already in train/test
-        if not src_singer_dir.exists():
-            continue
-            
+        if singer_id not in singer_dir_paths:
+            return (is_train, 0, 'no_source')
+        dest_exists = singer_id in (train_dirs_on_disk if is_train else test_dirs_on_disk)
+        
         try:
             if args.copy_files:
-                # Copy entire directory tree
-                if dest_singer_dir.exists():
+                # Copy entire directory tree. Singers are copied concurrently by the
+                # thread pool with in-kernel copy_file_range, rather than one rsync per
+                # split: that would need rsync on the host and serialise each split.
+                if dest_exists:
                     shutil.rmtree(dest_singer_dir)
-                shutil.copytree(src_singer_dir, dest_singer_dir)
-                
-                # Count files copied
-                wav_count = len(list(dest_singer_dir.rglob("*.wav")))
-                if singer_id in train_singers:
-                    train_files_moved += wav_count
-                else:
-                    test_files_moved += wav_count
-            else:
-                # Move entire directory
+                shutil.copytree(src_singer_dir, dest_singer_dir, copy_function=copy_file)
+            elif dest_exists:
+                # Keep shutil.move's move-into-existing-directory behaviour
                 shutil.move(str(src_singer_dir), str(dest_singer_dir))
-                
-                # Count files moved
-                wav_count = len(list(dest_singer_dir.rglob("*.wav")))
-                if singer_id in train_singers:
-                    train_files_moved += wav_count
-                else:
-                    test_files_moved += wav_count
+            else:
+                # Move entire directory: one rename on the same filesystem, and only
+                # fall back to shutil.move's recursive copy across devices
+                try:
+                    os.rename(src_singer_dir, dest_singer_dir)
+                except OSError as e:
+                    # Anything else (e.g. ENOTEMPTY if the destination appeared after the
+                    # index was built) must not fall through to shutil.move, which would nest
+                    # the singer inside it
+                    if e.errno != errno.EXDEV:
+                        raise
+                    shutil.move(str(src_singer_dir), str(dest_singer_dir))
             
-            processed += 1
-            # Print progress every 100 singers
-            if processed % 100 == 0:
-                elapsed = time.time() - start_time
-                print(f"Progress: {processed}/{total_singers} singers processed")
-                
+            # Count files moved/copied
+            wav_count = count_wavs(dest_singer_dir)
+            return (is_train, wav_count, 'success')
+        
         except Exception as e:
-            print(f"Error processing {singer_id}: {str(e)}")
+            return (is_train, 0, f'error: {str(e)}')
+    
+    def record(singer_id, result):
+        nonlocal train_files_moved, test_files_moved, errors
+        is_train, wav_count, status = result
+        if status == 'success':
+            if is_train:
+                train_files_moved += wav_count
+            else:
+                test_files_moved += wav_count
+        elif status.startswith('error'):
+            tqdm.write(f"Error processing {singer_id}: {status}")
             errors += 1
     
-    # Update CSV with split information (same approach as dataset_split.py)
-    print("\nUpdating CSV with split information...")
+    singers_to_process = list(unique_singer_ids)
     
-    def assign_split(singer_id):
-        return singer_split_map.get(singer_id, 'train')
+    if getattr(args, 'no_parallel', False):
+        # Sequential processing
+        print("Running in sequential mode...")
+        for singer_id in tqdm(singers_to_process, desc="Processing singers"):
+            record(singer_id, process_singer(singer_id))
+    else:
+        # Parallel processing: renames and copies are syscall-bound and release the GIL
+        print("Running in parallel mode...")
+        max_workers = max(1, min(32, len(singers_to_process)))
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_singer = {
+                executor.submit(process_singer, singer_id): singer_id
+                for singer_id in singers_to_process
+            }
+            
+            for future in tqdm(as_completed(future_to_singer), total=len(future_to_singer),
+                               desc="Processing singers"):
+                record(future_to_singer[future], future.result())
     
-    df['split'] = df[args.singer_id_header].apply(assign_split)
+    # Update CSV with split information (same approach as dataset_split.py)
+    print("\nUpdating CSV with split information...")
     
-    # Convert to numeric (0=train, 1=test) - note: no exp split in this version
-    df['split'] = df['split'].map({'train': 0, 'test': 1})
+    # Numeric split (0=train, 1=test) - note: no exp split in this version.
+    # Every singer not in the test set is train, so a membership test is enough.
+    df['split'] = df[args.singer_id_header].isin(test_set).astype('int8')
     
     # Print split statistics from CSV
     train_songs = (df['split'] == 0).sum()
@@ -276,16 +396,22 @@ def main():
     print(f"Total songs: {len(df)}")
     
     # Save the dataframe back to the input csv file (overwrites in place)
-    df.to_csv(input_csv_path, index=False)
-    print(f"Updated input CSV file with split info: {input_csv_path}")
+    if args.output_format in ("csv", "both"):
+        df.to_csv(input_csv_path, index=False)
+        print(f"Updated input CSV file with split info: {input_csv_path}")
+    if args.output_format in ("parquet", "both"):
+        parquet_path = input_csv_path.with_suffix(".parquet")
+        df.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+        print(f"Wrote split table as Parquet: {parquet_path}")
     
     # Create split_by_singer.json if singer_data was provided
     if singer_data:
         print("\nCreating split_by_singer.json...")
         split_by_singer = {}
+        csv_singer_ids = set(unique_singer_ids)
         
         for singer_id, info in singer_data.items():
-            if singer_id not in unique_singer_ids:
+            if singer_id not in csv_singer_ids:
                 continue
             
             split_type = singer_split_map.get(singer_id, "train")
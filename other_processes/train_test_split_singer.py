@@ -10,7 +10,8 @@ import random
 import shutil
 from pathlib import Path
 import time
-import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
 
 # Base paths
 base_dir = '/home/aik2/sc-rawnet3/datasets/hooktheory/audio_16k'
@@ -22,6 +23,11 @@ test_dir = os.path.join(base_dir, 'test', 'wav')
 os.makedirs(train_dir, exist_ok=True)
 os.makedirs(test_dir, exist_ok=True)
 
+# Hardlinks only work within one filesystem; when the splits live elsewhere, copy straight away
+# rather than failing an os.link per file first
+wav_dev = os.stat(wav_dir).st_dev
+can_link = os.stat(train_dir).st_dev == wav_dev and os.stat(test_dir).st_dev == wav_dev
+
 # Path to singer data JSON
 singer_data_path = '/home/aik2/sc-rawnet3/datasets/hooktheory/singer_data_complete.json'
 
@@ -34,11 +40,56 @@ except Exception as e:
     print(f"Error loading singer data: {e}")
     exit(1)
 
+
+# scandir answers is_dir()/is_file() from the directory listing, so no stat per entry
+def list_subdirs(directory):
+    with os.scandir(directory) as it:
+        return [entry.name for entry in it if entry.is_dir()]
+
+
+def list_wavs(directory):
+    with os.scandir(directory) as it:
+        return [entry.path for entry in it if entry.name.endswith('.wav') and entry.is_file()]
+
+
+def link_or_copy(src, dst):
+    """Hardlink src to dst (a single metadata op, no extra space); copy only across filesystems."""
+    if not can_link:
+        shutil.copy2(src, dst)  # sendfile in-kernel on Linux; per-file cost is a few syscalls
+        return
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        # Rerun: leave an existing link alone, overwrite anything else
+        if not os.path.samefile(src, dst):
+            shutil.copy2(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)  # Using copy2 to preserve metadata
+
+
+def link_batch(batch):
+    """Link or copy a batch of (src, dst, is_train) jobs in one pool task.
+    Returns (train_done, test_done, failures) where failures holds (src, error) pairs."""
+    train_done = test_done = 0
+    failures = []
+    for src, dst, is_train in batch:
+        try:
+            link_or_copy(src, dst)
+        except Exception as e:
+            failures.append((src, str(e)))
+            continue
+        if is_train:
+            train_done += 1
+        else:
+            test_done += 1
+    return train_done, test_done, failures
+
+
 # Start counting statistics
 start_time = time.time()
 
 # Count number of singers in the dataset
-singer_dirs = [d for d in os.listdir(wav_dir) if os.path.isdir(os.path.join(wav_dir, d))]
+singer_dirs = list_subdirs(wav_dir)
 total_singers = len(singer_dirs)
 print(f"Total number of singers: {total_singers}")
 
@@ -51,9 +102,7 @@ singers_with_2to4_songs = []
 singer_song_counts = {}
 
 for singer_id in singer_dirs:
-    singer_dir = os.path.join(wav_dir, singer_id)
-    song_dirs = [d for d in os.listdir(singer_dir) if os.path.isdir(os.path.join(singer_dir, d))]
-    song_count = len(song_dirs)
+    song_count = len(list_subdirs(os.path.join(wav_dir, singer_id)))
     singer_song_counts[singer_id] = song_count
     
     if 2 <= song_count <= 4:
@@ -68,18 +117,22 @@ random.shuffle(singers_with_2to4_songs)
 
 test_singers = singers_with_2to4_songs[:ntest]
 if len(test_singers) < ntest:
-    remaining_singers = [s for s in singer_dirs if s not in test_singers and s not in singers_with_2to4_songs]
+    # Every 2-4 song singer is already in test_singers at this point
+    preferred_set = set(singers_with_2to4_songs)
+    remaining_singers = [s for s in singer_dirs if s not in preferred_set]
     random.shuffle(remaining_singers)
     test_singers += remaining_singers[:ntest - len(test_singers)]
 
 # Train singers are all singers not in test set
-train_singers = [s for s in singer_dirs if s not in test_singers]
+test_set = set(test_singers)
+train_singers = [s for s in singer_dirs if s not in test_set]
 
 print(f"Final test set size: {len(test_singers)} singers")
 print(f"Final train set size: {len(train_singers)} singers")
 
 # Create dictionary to keep track of singers and their split
-singer_split = {singer_id: "train" if singer_id in train_singers else "test" for singer_id in singer_dirs}
+# Every later per-singer and per-file split check is a lookup here, not a list scan
+singer_split = {singer_id: "test" if singer_id in test_set else "train" for singer_id in singer_dirs}
 
 # Counters for statistics
 train_files_moved = 0
@@ -89,21 +142,21 @@ errors = 0
 # Move files to their respective directories
 print("\nMoving files to train/test directories...")
 
+# Create the destination tree while walking the source, and queue the file jobs
+jobs = []
 for singer_id in singer_dirs:
     # Source directory
     src_singer_dir = os.path.join(wav_dir, singer_id)
+    is_train = singer_split[singer_id] == "train"
     
     # Destination directory
-    if singer_id in train_singers:
-        dest_singer_dir = os.path.join(train_dir, singer_id)
-    else:
-        dest_singer_dir = os.path.join(test_dir, singer_id)
+    dest_singer_dir = os.path.join(train_dir if is_train else test_dir, singer_id)
     
     # Create destination directory
     os.makedirs(dest_singer_dir, exist_ok=True)
     
     # Iterate through song directories
-    song_dirs = [d for d in os.listdir(src_singer_dir) if os.path.isdir(os.path.join(src_singer_dir, d))]
+    song_dirs = list_subdirs(src_singer_dir)
     
     for song_id in song_dirs:
         src_song_dir = os.path.join(src_singer_dir, song_id)
@@ -113,29 +166,26 @@ for singer_id in singer_dirs:
         os.makedirs(dest_song_dir, exist_ok=True)
         
         # Find all wav files in the song directory
-        wav_files = glob.glob(os.path.join(src_song_dir, "*.wav"))
-        
-        for wav_file in wav_files:
-            filename = os.path.basename(wav_file)
-            dest_file = os.path.join(dest_song_dir, filename)
-            
-            try:
-                shutil.copy2(wav_file, dest_file)  # Using copy2 to preserve metadata
-                if singer_id in train_singers:
-                    train_files_moved += 1
-                else:
-                    test_files_moved += 1
-                
-                # Print progress every 100 files
-                if (train_files_moved + test_files_moved) % 100 == 0:
-                    elapsed = time.time() - start_time
-                    speed = (train_files_moved + test_files_moved) / elapsed if elapsed > 0 else 0
-                    print(f"Progress: {train_files_moved + test_files_moved} files moved")
-                    print(f"Train: {train_files_moved}, Test: {test_files_moved}")
-                    print(f"Speed: {speed:.2f} files/second")
-            except Exception as e:
-                print(f"Error copying file {wav_file}: {str(e)}")
-                errors += 1
+        for wav_file in list_wavs(src_song_dir):
+            jobs.append((wav_file, os.path.join(dest_song_dir, os.path.basename(wav_file)), is_train))
+
+# Link/copy in parallel (I/O bound); one future per batch, ~16 batches per worker
+num_workers = (os.cpu_count() or 1) * 2
+chunksize = max(1, len(jobs) // (num_workers * 16))
+batches = [jobs[i:i + chunksize] for i in range(0, len(jobs), chunksize)]
+
+with ThreadPoolExecutor(max_workers=num_workers) as executor:
+    futures = {executor.submit(link_batch, batch): len(batch) for batch in batches}
+    
+    with tqdm(total=len(jobs), desc="Moving files", unit="file") as pbar:
+        for future in as_completed(futures):
+            train_done, test_done, failures = future.result()
+            train_files_moved += train_done
+            test_files_moved += test_done
+            for wav_file, err in failures:
+                print(f"Error copying file {wav_file}: {err}")
+            errors += len(failures)
+            pbar.update(futures[future])
 
 # Create new split_by_singer.json
 print("\nCreating split_by_singer.json...")
@@ -143,30 +193,36 @@ print("\nCreating split_by_singer.json...")
 split_by_singer = {}
 
 for singer_id, info in singer_data.items():
-    if singer_id not in singer_dirs:
+    if singer_id not in singer_split:
         continue  # Skip singers not in the wav directory
     
-    split_type = "train" if singer_id in train_singers else "test"
+    split_type = singer_split[singer_id]
     artist_name = info["artist_name"]
     audio_paths = []
     
     # Get song directories for this singer
     singer_dir = os.path.join(wav_dir, singer_id)
     if os.path.exists(singer_dir):
-        song_dirs = [d for d in os.listdir(singer_dir) if os.path.isdir(os.path.join(singer_dir, d))]
+        song_dirs = list_subdirs(singer_dir)
+        
+        # Index original paths (.../{song_id}/vocals.wav) by song folder once per singer,
+        # keeping the first path per song as the old scan did
+        singer_audio_paths = info.get("audio_paths", [])
+        path_by_song = {}
+        for audio_item in singer_audio_paths:
+            path_by_song.setdefault(os.path.basename(os.path.dirname(audio_item)), audio_item)
         
         for song_id in song_dirs:
+            # Get original path from singer_data_complete.json
+            original_path = path_by_song.get(song_id)
+            if original_path is None:
+                # Paths outside the usual layout: fall back to a substring match
+                original_path = next((p for p in singer_audio_paths if song_id in p), None)
+            
             # Find wav files
-            wav_files = glob.glob(os.path.join(singer_dir, song_id, "*.wav"))
+            wav_files = list_wavs(os.path.join(singer_dir, song_id))
             
             for wav_file in wav_files:
-                # Get original path from singer_data_complete.json
-                original_path = None
-                for audio_item in info.get("audio_paths", []):
-                    if song_id in audio_item:
-                        original_path = audio_item
-                        break
-                
                 # Create path to 16k wav file in train/test directory
                 filename = os.path.basename(wav_file)
                 path_16k = os.path.join(base_dir, split_type, "wav", singer_id, song_id, filename)
@@ -5,49 +5,113 @@ Takes 5 common arguments and maps them appropriately to each script.
 """
 
 import argparse
+import hashlib
+import logging
+import logging.handlers
+import multiprocessing
 import subprocess
 import sys
 import os
 import random
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
 
 # Get the directory where this script is located
-SCRIPT_DIR = Path(__file__).parent
+SCRIPT_DIR = Path(__file__).resolve().parent
+PY = sys.executable
+# Arguments that only choose which/how steps run; they don't change any step's output
+RUN_CONTROL_ARGS = {"step", "stop_step", "force", "verbose", "no_parallel"}
+# Absolute paths of the steps still run as scripts, so they need no particular cwd
+SCRIPTS = {
+    name: str(SCRIPT_DIR / name)
+    for name in (
+        "check_folder_csv.py",
+        "assign_singer_id.py",
+        "to_singer_id.py",
+        "dataset_split.py",
+        "siqi_train_test_exp_split_singer.py",
+        "make_test_pairs.py",
+    )
+}
 
-def run_command(cmd: list, step_name: str):
-    """Run a command and handle errors. Exits immediately on any failure."""
+def run_command(cmd: tuple, step_name: str, verbose: bool = False):
+    """Run a command, relaying its output. Raises CalledProcessError if it fails."""
     print(f"\n{'='*60}")
     print(f"Step: {step_name}")
-    print(f"Command: {' '.join(cmd)}")
+    if verbose:
+        print(f"Command: {' '.join(cmd)}")
+    print(f"{'='*60}\n")
+    
+    # Relay the step's output in whatever-is-available chunks (up to 64 KiB) rather
+    # than letting every child print hit the terminal on its own
+    sys.stdout.flush()
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+        fd = proc.stdout.fileno()
+        for chunk in iter(lambda: os.read(fd, 1 << 16), b""):
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    print(f"\n✅ {step_name} completed successfully")
+
+
+def run_step(fn, kwargs: dict, step_name: str, verbose: bool = False):
+    """
+    Call a step's entry point in this interpreter, with the same banner and
+    exit-on-failure behaviour as run_command but no interpreter start-up.
+    """
+    print(f"\n{'='*60}")
+    print(f"Step: {step_name}")
+    if verbose:
+        print(f"Call: {fn.__module__}.{fn.__name__}({', '.join(f'{k}={v!r}' for k, v in kwargs.items())})")
     print(f"{'='*60}\n")
     
     try:
-        result = subprocess.run(cmd, cwd=SCRIPT_DIR, check=False)
-        
-        if result.returncode != 0:
-            print(f"\n❌ Error in {step_name}")
-            print(f"Command failed with exit code {result.returncode}")
-            print(f"Pipeline stopped. Fix the error before continuing.")
-            sys.exit(1)
-        else:
-            print(f"\n✅ {step_name} completed successfully")
-            
-    except FileNotFoundError as e:
-        print(f"\n❌ Error in {step_name}")
-        print(f"Script not found: {e}")
-        print(f"Pipeline stopped.")
-        sys.exit(1)
-    except subprocess.SubprocessError as e:
-        print(f"\n❌ Error in {step_name}")
-        print(f"Subprocess error: {e}")
-        print(f"Pipeline stopped.")
-        sys.exit(1)
+        fn(**kwargs)
     except Exception as e:
-        print(f"\n❌ Unexpected error in {step_name}")
+        print(f"\n❌ Error in {step_name}")
         print(f"Error: {e}")
-        print(f"Pipeline stopped.")
+        print(f"Pipeline stopped. Fix the error before continuing.")
         sys.exit(1)
+    print(f"\n✅ {step_name} completed successfully")
+
+
+class _RootHandlers(logging.Handler):
+    """
+    Pass each forwarded worker record to the root logger's handlers at the time it
+    arrives, so records land in the log file of the step that is running (desilence_split
+    swaps in its own file handler for step 2) rather than the handlers at pool start.
+    """
+
+    def emit(self, record: logging.LogRecord) -> None:
+        for handler in list(logging.getLogger().handlers):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def start_audio_pool(num_workers: int):
+    """
+    Start one process pool for the per-file audio steps (1 and 2), so its workers are
+    spawned and import the step modules once rather than once per step. Workers forward
+    their log records to the returned listener, as desilence_split's own pool does.
+    """
+    import reformat_data  # noqa: F401  (configures root logging)
+    import desilence_split
+    
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(["reformat_data", "desilence_split"])
+    log_queue = ctx.Queue()
+    listener = logging.handlers.QueueListener(log_queue, _RootHandlers())
+    listener.start()
+    pool = ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=ctx,
+        initializer=desilence_split._worker_init,
+        initargs=(log_queue,),
+    )
+    return pool, listener
 
 
 def main():
@@ -75,12 +139,6 @@ def main():
         # default="/home/brendanoconnor/gs_imports",
         help="Directory to store datasets)",
     )
-    parser.add_argument(
-        "--wav_depth",
-        type=int,
-        default=1,
-        help="Depth of the wav directory. Default is 1: audio/*.wav -> audio/<track_name>/chunks. 2: dataset/audio/<voice_id>/<song_id>.wav -> dataset/audio/<voice_id>/<song_id>/chunks.",
-    )
     parser.add_argument(
         "--step",
         type=int,
@@ -147,6 +205,18 @@ def main():
         required=True,
         help="Target sample rate in Hz",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        default=False,
+        help="Rerun steps even if they already completed with the same settings (by default a leading run of completed steps is skipped)",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        default=False,
+        help="Print the full command or call for each step",
+    )
     parser.add_argument(
         "--no-parallel",
         action="store_true",
@@ -175,115 +245,208 @@ def main():
     print(f"Running preprocessing steps {args.step} to {args.stop_step} (inclusive)")
     print(f"{'='*60}\n")
     
-    # Derive dataset_path from csv_gs_path
-    dataset_path = Path(args.dataset_dir)
+    # Resolve dataset_path once, so every step sees the same absolute path
+    dataset_path = Path(args.dataset_dir).expanduser().resolve()
     dataset_path_str = str(dataset_path)
     
+    # Every file or directory the steps read or write, built once
+    artifacts = SimpleNamespace(
+        root=dataset_path,
+        audio_dir=dataset_path / "audio",
+        data_csv=dataset_path / "data.csv",
+        singer_id_map=dataset_path / "singer_id_mapping_filtered.json",
+        hash_csv=dataset_path / "trackname_to_md5name_mapping.csv",
+        test_dir=dataset_path / "audio" / "test",
+        test_pairs=dataset_path / "test_pairs.txt",
+        cache_dir=dataset_path / ".cache",
+    )
+    
+    # Key for this run's settings: a step only counts as done if it completed with the
+    # same arguments, so e.g. a new --seed or mapping JSON reruns it.
+    config = {k: v for k, v in sorted(vars(args).items()) if k not in RUN_CONTROL_ARGS}
+    config_key = hashlib.blake2b(repr(config).encode("utf-8"), digest_size=16).hexdigest()
+    
+    def done_marker(step: int) -> Path:
+        return artifacts.cache_dir / f"step{step}.{config_key}.done"
+    
+    def mark_done(step: int) -> None:
+        artifacts.cache_dir.mkdir(exist_ok=True)
+        done_marker(step).touch()
+    
+    def invalidate_from(step: int) -> None:
+        # This step is about to rewrite its outputs, so its marker and every later step's
+        # (built on the old outputs) no longer describe what is on disk
+        for later in range(step, 9):
+            for old in artifacts.cache_dir.glob(f"step{later}.*.done"):
+                old.unlink()
+    
+    # Canonical output of the steps that leave one; it must also still exist for the step to
+    # count as done.
+    step_outputs = {
+        3: artifacts.data_csv,
+        4: artifacts.singer_id_map,
+        6: artifacts.hash_csv,
+        8: artifacts.test_pairs,
+    }
+    
+    # Only the leading run of completed steps is skipped: once any step runs, invalidate_from
+    # drops the later markers, so every later step runs too and never mixes with stale outputs.
+    def should_run(step: int) -> bool:
+        if not args.step <= step <= args.stop_step:
+            return False
+        output = step_outputs.get(step)
+        if (not args.force and done_marker(step).exists()
+                and (output is None or output.exists())):
+            print(f"\n⏭  Skipping step {step}: already completed with these settings (use --force to rerun)")
+            return False
+        invalidate_from(step)
+        return True
+    
     # Helper to add --no-parallel flag if set
-    no_parallel_flag = ['--no-parallel'] if getattr(args, 'no_parallel', False) else []
+    no_parallel_flag = ('--no-parallel',) if getattr(args, 'no_parallel', False) else ()
+    common = ("--dataset_path", dataset_path_str)
     
-    # Step 1: Resample audio in place (GCS data assumed already downloaded at dataset_path)
-    if args.step <= 1 <= args.stop_step:
-        cmd = [
-            sys.executable,
-            "reformat_data.py",
-            "--audio_dir", dataset_path_str,
-            "--target_sample_rate", str(args.target_sample_rate),
-            *(["--num_workers", "1"] if getattr(args, "no_parallel", False) else []),
-        ]
-        run_command(
-            cmd,
-            "1. Resample audio (in place)",
-        )
+    # Steps with a function entry point run in-process; the rest are still scripts.
+    # Steps run strictly one after another: audio is already local, steps 1-2 each
+    # saturate every core on their own, and steps 3+ need the whole dataset (dedupe,
+    # singer IDs and splits are computed across all tracks), so there is no per-song
+    # stage to overlap.
     
-    # Step 2: Split audio on silence
-    if args.step <= 2 <= args.stop_step:
-        cmd = [
-            sys.executable,
-            "desilence_split.py",
-            "--dataset_path", dataset_path_str,
-        ]
-        if args.wav_depth == 2:
-            cmd.extend(["--wav_depth", "2"])
-        else:
-            cmd.extend(["--wav_depth", "1"])
-        run_command(
-            cmd,
-            "2. Split audio on silence"
-        )
-
-
+    # Steps 1 and 2 share one warm process pool when both run in parallel mode
+    audio_pool, log_listener = None, None
+    if not getattr(args, "no_parallel", False) and args.step <= 2 and args.stop_step >= 1:
+        audio_pool, log_listener = start_audio_pool(multiprocessing.cpu_count())
+    
+    try:
+        # Step 1: Resample audio in place (GCS data assumed already downloaded at dataset_path)
+        if should_run(1):
+            import reformat_data
+            run_step(
+                reformat_data.main,
+                dict(
+                    audio_dir=dataset_path_str,
+                    target_sample_rate=args.target_sample_rate,
+                    num_workers=1 if getattr(args, "no_parallel", False) else None,
+                    executor=audio_pool,
+                ),
+                "1. Resample audio (in place)",
+                verbose=args.verbose,
+            )
+            mark_done(1)
+        
+        # Step 2: Split audio on silence (reads the .wav files directly under dataset_path/audio)
+        if should_run(2):
+            import desilence_split
+            run_step(
+                desilence_split.main,
+                dict(
+                    dataset_path=dataset_path_str,
+                    min_silence_len=2000,
+                    silence_thresh=-40,
+                    keep_silence=100,
+                    min_segment_len=3000,
+                    includes_audio_subdirs=True,
+                    executor=audio_pool,
+                ),
+                "2. Split audio on silence",
+                verbose=args.verbose,
+            )
+            mark_done(2)
+    finally:
+        if audio_pool is not None:
+            audio_pool.shutdown()
+            log_listener.stop()
+    
+    # Steps 3-5 each read and rewrite data.csv rather than passing one DataFrame along.
+    # The CSV is one row per track and parses in well under a second, while the steps'
+    # real cost is filesystem work (step 4 deletes filtered artists' folders, step 5
+    # moves every track), so data.csv doubles as the checkpoint a rerun resumes from.
     
     # Step 3: Check folder CSV and create deduplicated_data.csv
-    if args.step <= 3 <= args.stop_step:
-        cmd = [
-            sys.executable,
-            "check_folder_csv.py",
-            "--dataset_path", dataset_path_str,
+    if should_run(3):
+        cmd = (
+            PY,
+            SCRIPTS["check_folder_csv.py"],
+            *common,
             "--uri_name_header", args.uri_name_header,
             "--seed", str(args.seed),
             *(['--gs_file_uri_in_csv'] if args.gs_file_uri_in_csv else []),
-        ]
+        )
         run_command(
             cmd,
-            "3. Check folder CSV and deduplicate"
+            "3. Check folder CSV and deduplicate",
+            verbose=args.verbose,
         )
+        mark_done(3)
     
     # Step 4: Assign singer IDs
-    if args.step <= 4 <= args.stop_step:
-        cmd = [
-            sys.executable,
-            "assign_singer_id.py",
-            "--dataset_path", dataset_path_str,
+    if should_run(4):
+        cmd = (
+            PY,
+            SCRIPTS["assign_singer_id.py"],
+            *common,
             "--artist_name_header", args.artist_name_header,
             *no_parallel_flag,
-        ]
+        )
         # Add singer ID mapping JSON if provided
         if args.singer_id_mapping_json:
-            cmd.extend(["--singer_id_mapping_json", args.singer_id_mapping_json])
+            cmd += ("--singer_id_mapping_json", args.singer_id_mapping_json)
         
         run_command(
             cmd,
-            "4. Assign singer IDs"
+            "4. Assign singer IDs",
+            verbose=args.verbose,
         )
+        mark_done(4)
     
     # Step 5: Reorganize to singer_id directories
     # Assuming file_name_header is same as file_name_header, and singer_id_header is "singer_id"
-    if args.step <= 5 <= args.stop_step:
+    if should_run(5):
         run_command(
-            [
-                sys.executable,
-                "to_singer_id.py",
-                "--dataset_path", dataset_path_str,
+            (
+                PY,
+                SCRIPTS["to_singer_id.py"],
+                *common,
                 "--file_name_header", args.file_name_header,
                 "--singer_id_header", "singer_id",
                 *no_parallel_flag,
-            ],
-            "5. Reorganize to singer_id directories"
+            ),
+            "5. Reorganize to singer_id directories",
+            verbose=args.verbose,
         )
+        mark_done(5)
     
     # Step 6: Hash song names
-    if args.step <= 6 <= args.stop_step:
-        output_csv_path = dataset_path / "trackname_to_md5name_mapping.csv"
-        run_command(
-            [
-                sys.executable,
-                "hash_songnames.py",
-                "--dataset_path", str(dataset_path),
-                "--output_csv_path", str(output_csv_path),
-                *no_parallel_flag,
-            ],
-            "6. Hash song names"
+    # Must finish before step 7: hashing renames audio/<singer_id>/<song> folders, and the
+    # split then moves each audio/<singer_id> under audio/{train,test,exp}, so running
+    # them concurrently would race on the same directories.
+    if should_run(6):
+        import hash_songnames
+        base_dir = artifacts.audio_dir
+        if not base_dir.is_dir():
+            print(f"\n❌ Error in 6. Hash song names")
+            print(f"{base_dir} is not a valid directory.")
+            sys.exit(1)
+        run_step(
+            hash_songnames.process_second_level_folders,
+            dict(
+                base_dir=str(base_dir),
+                csv_path=str(artifacts.hash_csv),
+                parallel=not getattr(args, "no_parallel", False),
+            ),
+            "6. Hash song names",
+            verbose=args.verbose,
         )
+        mark_done(6)
     
     # Step 7: Dataset split (standard 80:10:10, Siqi's 90:10, Siqi's exp split, or matching reference dataset)
-    if args.step <= 7 <= args.stop_step:
+    if should_run(7):
         if args.siqi_exp_split:
             # Use Siqi's train/test/exp split (test from 2-5 songs, exp sampled from ranges)
-            cmd = [
-                sys.executable,
-                "siqi_train_test_exp_split_singer.py",
-                "--dataset_path", dataset_path_str,
+            cmd = (
+                PY,
+                SCRIPTS["siqi_train_test_exp_split_singer.py"],
+                *common,
                 "--input_csv_name", "data.csv",
                 "--artist_name_header", args.artist_name_header,
                 "--singer_id_header", "singer_id",
@@ -291,56 +454,57 @@ def main():
                 "--test_ratio", str(args.siqi_test_ratio),
                 "--exp_samples_per_range", str(args.siqi_exp_samples_per_range),
                 *no_parallel_flag,
-            ]
+            )
             # Add singer data JSON if provided
             if args.siqi_singer_data_json:
-                cmd.extend(["--singer_data_json", args.siqi_singer_data_json])
+                cmd += ("--singer_data_json", args.siqi_singer_data_json)
             
             run_command(
                 cmd,
-                "7. Dataset split - Siqi exp method (train/test/exp)"
+                "7. Dataset split - Siqi exp method (train/test/exp)",
+                verbose=args.verbose,
             )
         else:
             # Use standard dataset_split.py (80:10:10)
-            cmd = [
-                sys.executable,
-                "dataset_split.py",
-                "--dataset_path", dataset_path_str,
+            cmd = (
+                PY,
+                SCRIPTS["dataset_split.py"],
+                *common,
                 "--input_csv_name", "data.csv",
                 "--artist_name_header", args.artist_name_header,
                 "--singer_id_header", "singer_id",
                 "--seed", str(args.seed),
                 *no_parallel_flag,
-            ]
+            )
             # Add reference dataset path if provided
             if args.reference_dataset_path:
-                cmd.extend(["--reference_dataset_path", args.reference_dataset_path])
+                cmd += ("--reference_dataset_path", args.reference_dataset_path)
             
             run_command(
                 cmd,
-                "7. Dataset split (train/val/test 80:10:10)"
+                "7. Dataset split (train/val/test 80:10:10)",
+                verbose=args.verbose,
             )
+        mark_done(7)
     
     # Step 8: Create test pairs
-    if args.step <= 8 <= args.stop_step:
-        test_dir = dataset_path / "audio" / "test"
-        output_pairs_path = dataset_path / "test_pairs.txt"
-        subset_split_csv = dataset_path / "data.csv"
-        
+    if should_run(8):
         run_command(
-            [
-                sys.executable,
-                "make_test_pairs.py",
-                "--csv_path", str(subset_split_csv),
-                "--test_dir", str(test_dir),
-                "--output_path", str(output_pairs_path),
+            (
+                PY,
+                SCRIPTS["make_test_pairs.py"],
+                "--csv_path", str(artifacts.data_csv),
+                "--test_dir", str(artifacts.test_dir),
+                "--output_path", str(artifacts.test_pairs),
                 "--singer_id_header", "singer_id",
                 "--split_header", "split",
                 "--file_name_header", args.file_name_header,
                 "--seed", str(args.seed),
-            ],
-            "8. Create test pairs"
+            ),
+            "8. Create test pairs",
+            verbose=args.verbose,
         )
+        mark_done(8)
     
     print(f"\n{'='*60}")
     print(f"🎉 Preprocessing steps {args.step} to {args.stop_step} completed successfully!")
@@ -353,6 +517,11 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\n\n⚠️  Pipeline interrupted by user")
         sys.exit(130)
+    except subprocess.CalledProcessError as e:
+        print(f"\n❌ Step failed: {' '.join(e.cmd)}")
+        print(f"Command failed with exit code {e.returncode}")
+        print(f"Pipeline stopped. Fix the error before continuing.")
+        sys.exit(e.returncode)
     except Exception as e:
         print(f"\n\n❌ Fatal error in preprocessing pipeline: {e}")
         import traceback
@@ -20,7 +20,8 @@ import subprocess
 import tempfile
 import time
 import multiprocessing
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
 from functools import partial
 from pathlib import Path
 from typing import List, Optional, Tuple
@@ -182,7 +183,12 @@ def main(
     num_workers: Optional[int] = None,
     output_dir: Optional[str] = None,
     stereo_out: bool = False,
+    executor: Optional[Executor] = None,
 ):
+    """
+    Resample every audio file under `audio_dir`. If `executor` is given, tasks run on
+    that (caller-owned, still open afterwards) pool instead of a new one.
+    """
     audio_dir = Path(audio_dir).resolve()
     if not audio_dir.exists():
         logger.error(f"Directory not found: {audio_dir}")
@@ -229,7 +235,8 @@ def main(
     print(f"(Files already at {target_sample_rate}Hz and {channel_mode} will be skipped)\n")
 
     task_args = [(src, dst, target_sample_rate, stereo_out) for src, dst in tasks]
-    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+    pool = ProcessPoolExecutor(max_workers=num_workers) if executor is None else nullcontext(executor)
+    with pool as executor:
         futures = {
             executor.submit(_resample_task, t): t[0]
             for t in task_args
@@ -1,56 +1,49 @@
 import pandas as pd
 import os
 import json
-import random  # Added for random assignment
+import numpy as np
 from pathlib import Path
 
 # 1. Load the dataframe
-# Assuming the data is stored in a CSV or similar format
-# If it's in a different format, you'll need to adjust this part
+# The reader is picked from the file extension; unknown extensions are sniffed from
+# the first bytes of the file so only one parser ever runs
+READERS = {
+    '.jsonl': lambda path: pd.read_json(path, lines=True),
+    '.csv': lambda path: pd.read_csv(path, engine='c'),
+    '.parquet': pd.read_parquet,
+    '.json': pd.read_json,
+}
+
+def sniff_suffix(file_path):
+    with open(file_path, 'rb') as f:
+        head = f.read(1 << 16)
+    if head.startswith(b'PAR1'):
+        return '.parquet'
+    text = head.lstrip()
+    if text.startswith(b'['):
+        return '.json'
+    if text.startswith(b'{'):
+        # JSONL puts one object per line, so another object starts after a newline
+        return '.jsonl' if b'\n{' in text.replace(b'\r\n', b'\n') else '.json'
+    return '.csv'
+
 def load_dataframe(file_path):
     try:
-        # Check file extension to determine the format
-        if file_path.endswith('.jsonl'):
-            # For JSONL files, use lines=True
-            df = pd.read_json(file_path, lines=True)
-        elif file_path.endswith('.csv'):
-            # Try loading as CSV
-            df = pd.read_csv(file_path)
-        elif file_path.endswith('.parquet'):
-            # Try loading as parquet
-            df = pd.read_parquet(file_path)
-        elif file_path.endswith('.json'):
-            # Try loading as regular JSON
-            df = pd.read_json(file_path)
-        else:
-            # If extension doesn't match, try each format
-            try:
-                # Try JSONL first (most common for this dataset)
-                df = pd.read_json(file_path, lines=True)
-            except:
-                try:
-                    # Try CSV
-                    df = pd.read_csv(file_path)
-                except:
-                    try:
-                        # Try parquet
-                        df = pd.read_parquet(file_path)
-                    except:
-                        try:
-                            # Try regular JSON
-                            df = pd.read_json(file_path)
-                        except Exception as e:
-                            print(f"Error loading dataframe: {e}")
-                            return None
+        suffix = Path(file_path).suffix.lower()
+        if suffix not in READERS:
+            suffix = sniff_suffix(file_path)
+        return READERS[suffix](file_path)
     except Exception as e:
         print(f"Error loading dataframe: {e}")
         return None
-    return df
 
 # Define output directory - use the same directory as the script
 output_dir = '/home/aik2/sc-rawnet3/datasets/hooktheory/'
 os.makedirs(output_dir, exist_ok=True)
 
+# Seed for the 10/90 test/train assignment, so reruns produce the same split
+split_seed = 0
+
 # Base path for the 16kHz files
 base_16k_path = '/home/aik2/sc-rawnet3/datasets/hooktheory/audio_16k/wav'
 
@@ -59,31 +52,34 @@ data_file = '/home/aik2/sc-rawnet3/datasets/hooktheory/cartesia-dataset-dec_10th
 df = load_dataframe(data_file)
 
 if df is not None:
-    # 2. Create a set of all artists in the dataset
-    artists = set(df['artist'].unique())
+    # 2. Dictionary-encode the artist column: categories are the sorted unique artists
+    # and each row holds only an integer code, so repeated names are stored once
+    artist_codes = pd.Categorical(df['artist'])
+    artists = artist_codes.categories
+    df['artist'] = artist_codes
     print(f"Found {len(artists)} unique artists")
     
     # 3. Create a dictionary that assigns a 5-digit unique singer ID to each artist
-    singer_id_dict = {}
-    for i, artist in enumerate(sorted(artists)):
-        # Create ID in the format "idXXXXX" where XXXXX is a zero-padded 5-digit number
-        singer_id = f"id{i+1:05d}"
-        singer_id_dict[artist] = singer_id
+    # IDs are in the format "idXXXXX" where XXXXX is a zero-padded 5-digit number
+    # Built as one fixed-width numpy string array rather than a Series of Python strings
+    singer_ids = np.char.add('id', np.char.zfill(np.arange(1, len(artists) + 1).astype(str), 5)).tolist()
+    singer_id_dict = dict(zip(artists, singer_ids))
     
     # 4. Create a dictionary mapping singer IDs to lists of audio file paths
-    singer_audio_paths = {singer_id: [] for singer_id in singer_id_dict.values()}
-    
-    # Populate the dictionary with audio file paths
-    for _, row in df.iterrows():
-        artist = row['artist']
-        audio_id = row['audio_id']
-        singer_id = singer_id_dict[artist]
-        
-        # Create the audio file path
-        audio_path = f"/home/aik2/gcs-mount/cartesia-dataset/dec_10th/hooktheory_18k_melody_cartesia_44k_outputs/{audio_id}/vocals.wav"
-        
-        # Add the path to the list for this singer ID
-        singer_audio_paths[singer_id].append(audio_path)
+    # groupby keeps row order within each singer; sorting the keys keeps the ID order
+    audio_root = "/home/aik2/gcs-mount/cartesia-dataset/dec_10th/hooktheory_18k_melody_cartesia_44k_outputs"
+    # Singer IDs share the artist codes, so the column needs no per-row lookup
+    df['singer_id'] = pd.Categorical.from_codes(artist_codes.codes, categories=singer_ids)
+    df['audio_path'] = audio_root + '/' + df['audio_id'].astype(str) + '/vocals.wav'
+    # 16kHz downsampled files live at <base_16k_path>/<singer_id>/<song_id>/00001.wav
+    df['path_16k'] = base_16k_path + '/' + df['singer_id'].astype(str) + '/' + df['audio_id'].astype(str) + '/00001.wav'
+    # Randomly assign 10% to test set (is_train=0) and 90% to train set (is_train=1)
+    rng = np.random.default_rng(split_seed)
+    df['is_train'] = (rng.random(len(df)) >= 0.1).astype(np.int8)
+    grouped = df.groupby('singer_id', sort=True, observed=True)
+    singer_audio_paths = grouped['audio_path'].agg(list).to_dict()
+    singer_paths_16k = grouped['path_16k'].agg(list).to_dict()
+    singer_is_train = grouped['is_train'].agg(list).to_dict()
     
     # Print some statistics
     print(f"Created mappings for {len(singer_id_dict)} artists")
@@ -102,7 +98,7 @@ if df is not None:
             print(f"  Example path: {paths[0]}")
     
     # Create a reverse mapping from singer ID to artist name
-    id_to_artist_dict = {singer_id: artist for artist, singer_id in singer_id_dict.items()}
+    id_to_artist_dict = dict(zip(singer_ids, artists))
     
     print("\nFirst 10 entries of ID to artist mapping:")
     for i, (singer_id, artist) in enumerate(list(id_to_artist_dict.items())[:10]):
@@ -110,8 +106,8 @@ if df is not None:
     
     # Create a comprehensive data structure with train/test split
     singer_data = {}
-    test_count = 0
-    train_count = 0
+    train_count = int(df['is_train'].sum())
+    test_count = len(df) - train_count
     
     for artist, singer_id in singer_id_dict.items():
         # Get all audio paths for this singer
@@ -119,23 +115,7 @@ if df is not None:
         
         # Convert paths to the new format with train/test split
         processed_paths = []
-        for path in paths:
-            # Randomly assign 10% to test set (is_train=0) and 90% to train set (is_train=1)
-            is_train = 0 if random.random() < 0.1 else 1
-            
-            # Count for statistics
-            if is_train == 0:
-                test_count += 1
-            else:
-                train_count += 1
-            
-            # Extract the song_id (folder name) from the original path
-            # e.g., from "/path/to/bWgMwEPPolX/vocals.wav" extract "bWgMwEPPolX"
-            song_id = Path(path).parent.name
-            
-            # Construct the path to the 16kHz downsampled file
-            path_16k = f"{base_16k_path}/{singer_id}/{song_id}/00001.wav"
-                
+        for path, path_16k, is_train in zip(paths, singer_paths_16k[singer_id], singer_is_train[singer_id]):
             # Add as dictionary with path, path_16k and is_train flag
             processed_paths.append({
                 "path": path,
@@ -171,22 +151,26 @@ if df is not None:
     split_file_path = os.path.join(output_dir, 'singer_data_split.json')
     complete_file_path = os.path.join(output_dir, 'singer_data_complete.json')
     
+    # json.dump with indent feeds the file one small fragment at a time; encoding with
+    # json.dumps and writing once gives the same bytes with a single write call
     try:
         with open(split_file_path, 'w') as f:
-            json.dump(singer_data, f, indent=2)
+            f.write(json.dumps(singer_data, indent=2))
         print(f"Successfully saved to {split_file_path}")
     except Exception as e:
         print(f"Error saving split file: {e}")
     
     # Also save the original comprehensive data for reference
+    # The grouped path lists are exactly the "path" fields of singer_data, so reuse
+    # them instead of walking every path record a second time
     try:
         with open(complete_file_path, 'w') as f:
-            json.dump({
+            f.write(json.dumps({
                 singer_id: {
-                    "artist_name": data["artist_name"],
-                    "audio_paths": [path_data["path"] for path_data in data["audio_paths"]]
-                } for singer_id, data in singer_data.items()
-            }, f, indent=2)
+                    "artist_name": artist,
+                    "audio_paths": singer_audio_paths[singer_id]
+                } for artist, singer_id in singer_id_dict.items()
+            }, indent=2))
         print(f"Successfully saved to {complete_file_path}")
     except Exception as e:
         print(f"Error saving complete file: {e}")
@@ -3,7 +3,7 @@ Split dataset into train, test, and exp sets by singer.
 
 This script splits singers into train, test (10%), and exp sets.
 Test set: Samples from singers with 2-5 songs.
-Exp set: Samples 10 singers from each song count range (1, 2-5, 5-10, 10-30, 30-100, 100+).
+Exp set: Samples 10 singers from each song count range (1, 2-5, 6-10, 11-30, 31-100, 101+).
 Train set: All remaining singers.
 
 All songs from the same singer are kept together in the same split.
@@ -13,11 +13,14 @@ Can be used as an alternative to dataset_split.py or siqis_train_test_split_sing
 
 import argparse
 import json
+import os
 import random
 import shutil
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 import time
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
@@ -82,7 +85,68 @@ def parse_args():
         action="store_true",
         help="Disable parallel processing (run sequentially)",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--output_format",
+        choices=["csv", "parquet", "both"],
+        default="csv",
+        help="Format of the updated split table: the input CSV in place (default), "
+             "a zstd Parquet file next to it (requires pyarrow), or both",
+    )
+    args = parser.parse_args()
+    # Parquet output needs pyarrow, which is not in requirements.txt: fail here, before any
+    # singer folder is moved, rather than after the split when the CSV may not be rewritten
+    if args.output_format != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error(f"--output_format {args.output_format} requires pyarrow (pip install pyarrow)")
+    return args
+
+
+def copy_file(src, dst):
+    """
+    copytree copy function that copies in the kernel with os.copy_file_range, which
+    also shares extents (reflinks) on XFS/Btrfs. Falls back to shutil.copy2 where the
+    call is unavailable or unsupported for this pair of files.
+    """
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                shutil.copystat(src, dst)
+                return dst
+        except OSError:
+            pass
+    return shutil.copy2(src, dst)
+
+
+def count_wavs(directory) -> int:
+    """Count .wav files under directory, walking it with os.scandir (no Path objects or globbing)."""
+    count = 0
+    stack = [str(directory)]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.endswith(".wav"):
+                    count += 1
+    return count
+
+
+def list_subdirs(directory) -> set:
+    """Names of the subdirectories of directory (empty if it does not exist), from one scandir."""
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name for entry in it if entry.is_dir()}
+    except FileNotFoundError:
+        return set()
 
 
 def main():
@@ -113,16 +177,18 @@ def main():
     
     # Load CSV
     print("Loading dataframe...")
-    df = pd.read_csv(input_csv_path)
+    # Only the singer/artist columns are used and the rest are written back untouched,
+    # so read everything as text: no per-column type inference, values round-trip as-is
+    df = pd.read_csv(input_csv_path, dtype=str, engine="c")
     print(f"CSV loaded with {len(df)} rows")
     
-    # Get singer counts
-    singer_id_counts = df.groupby(args.singer_id_header).agg({
-        args.artist_name_header: ['count', lambda x: x.str.lower().unique()]
-    }).reset_index()
-    
-    # Flatten column names
-    singer_id_counts.columns = [args.singer_id_header, 'song_count', 'artist_names']
+    # Get singer counts (songs with an artist name, per singer ID, sorted by ID)
+    singer_id_counts = (
+        df.groupby(args.singer_id_header)[args.artist_name_header]
+        .count()
+        .rename('song_count')
+        .reset_index()
+    )
     
     total_singers = len(singer_id_counts)
     print(f"Total unique singer IDs: {total_singers}")
@@ -167,35 +233,31 @@ def main():
     # From the remaining singers, sample for exp set
     remaining_singers = singer_id_counts[~singer_id_counts[args.singer_id_header].isin(test_singers)]
     
-    # Define the ranges and sample from each
-    exp_singers = []
-    ranges = [
-        (1, 1, "1 song"),
-        (2, 5, "2-5 songs"),
-        (5, 10, "5-10 songs"),
-        (10, 30, "10-30 songs"),
-        (30, 100, "30-100 songs"),
-        (100, float('inf'), "100+ songs")
-    ]
-    
-    for min_songs, max_songs, description in ranges:
-        if max_songs == float('inf'):
-            range_singers = remaining_singers[remaining_singers['song_count'] >= min_songs]
-        else:
-            range_singers = remaining_singers[remaining_singers['song_count'].between(min_songs, max_songs)]
-        
-        print(f"Singers with {description}: {len(range_singers)}")
-        
-        if len(range_singers) >= args.exp_samples_per_range:
-            sampled = range_singers[args.singer_id_header].sample(
-                n=args.exp_samples_per_range, random_state=args.seed
-            ).tolist()
-        else:
-            sampled = range_singers[args.singer_id_header].tolist()
-            print(f"  Warning: Only {len(sampled)} singers available, taking all")
-        
-        exp_singers.extend(sampled)
-        print(f"  Selected {len(sampled)} singers for exp set")
+    # Bin every remaining singer by song count once, then draw each bin's sample from
+    # a single seeded shuffle. Bin edges are right-inclusive, so a boundary count
+    # (5, 10, 30, 100) belongs to exactly one range and no singer is drawn twice.
+    range_edges = [0, 1, 5, 10, 30, 100, np.inf]
+    range_labels = ["1 song", "2-5 songs", "6-10 songs", "11-30 songs", "31-100 songs", "101+ songs"]
+    song_count_bins = pd.cut(
+        remaining_singers['song_count'], bins=range_edges, labels=range_labels, right=True
+    )
+    range_sizes = song_count_bins.value_counts(sort=False)
+    
+    exp_sample = (
+        remaining_singers.assign(_bin=song_count_bins)
+        .sample(frac=1, random_state=args.seed)
+        .groupby('_bin', observed=True)
+        .head(args.exp_samples_per_range)
+    )
+    sampled_sizes = exp_sample['_bin'].value_counts(sort=False)
+    exp_singers = exp_sample[args.singer_id_header].tolist()
+    
+    for description in range_labels:
+        available = int(range_sizes[description])
+        print(f"Singers with {description}: {available}")
+        if available < args.exp_samples_per_range:
+            print(f"  Warning: Only {available} singers available, taking all")
+        print(f"  Selected {int(sampled_sizes[description])} singers for exp set")
     
     print(f"Total exp singers: {len(exp_singers)}")
     
@@ -203,35 +265,31 @@ def main():
     unique_singer_ids = df[args.singer_id_header].unique()
     
     # Train singers are all singers not in test or exp sets
-    train_singers = [s for s in unique_singer_ids if s not in test_singers and s not in exp_singers]
+    held_out = frozenset(test_singers).union(exp_singers)
+    train_singers = [s for s in unique_singer_ids if s not in held_out]
     
     print(f"Final train set size: {len(train_singers)} singers")
     print(f"Final test set size: {len(test_singers)} singers")
     print(f"Final exp set size: {len(exp_singers)} singers")
     
     # Create split mapping
-    singer_split_map = {}
-    for singer_id in train_singers:
-        singer_split_map[singer_id] = 'train'
-    for singer_id in test_singers:
-        singer_split_map[singer_id] = 'test'
-    for singer_id in exp_singers:
-        singer_split_map[singer_id] = 'exp'
-    
-    # Find singer directories in audio folder
+    singer_split_map = dict.fromkeys(train_singers, 'train')
+    singer_split_map.update(dict.fromkeys(test_singers, 'test'))
+    singer_split_map.update(dict.fromkeys(exp_singers, 'exp'))
+    
+    # Find singer directories in audio folder, and those already placed in a split.
+    # Indexed once up front so process_singer checks sets instead of stat-ing paths.
     exclude_dirs = {'train', 'test', 'exp'}
-    singer_dirs_on_disk = set()
-    if audio_dir.exists():
-        singer_dirs_on_disk = {
-            d.name for d in audio_dir.iterdir()
-            if d.is_dir() and d.name not in exclude_dirs
-        }
+    singer_dirs_on_disk = list_subdirs(audio_dir) - exclude_dirs
     print(f"Singer directories found on disk: {len(singer_dirs_on_disk)}")
+    split_dirs_on_disk = {
+        'train': list_subdirs(train_dir),
+        'test': list_subdirs(test_dir),
+        'exp': list_subdirs(exp_dir),
+    }
     
     # Counters for statistics
-    train_files_moved = 0
-    test_files_moved = 0
-    exp_files_moved = 0
+    files_per_split = {'train': 0, 'test': 0, 'exp': 0}
     skipped = 0
     errors = 0
     
@@ -241,114 +299,76 @@ def main():
     
     # Helper function to process a single singer
     def process_singer(singer_id):
-        """Process a single singer directory. Returns (split_type, wav_count, status)."""
-        src_singer_dir = audio_dir / singer_id
-        
-        # Determine destination
-        split_type = singer_split_map.get(singer_id, 'train')
-        if split_type == 'train':
-            dest_singer_dir = train_dir / singer_id
-        elif split_type == 'test':
-            dest_singer_dir = test_dir / singer_id
-        else:  # exp
-            dest_singer_dir = exp_dir / singer_id
-        
-        # Check if source directory exists
-        if not src_singer_dir.exists():
-            return (split_type, 0, 'no_source')
-        
-        # Check if destination already exists (skip if so)
-        if dest_singer_dir.exists():
-            # Count existing files for stats
-            wav_count = len(list(dest_singer_dir.rglob("*.wav")))
-            return (split_type, wav_count, 'skipped')
-        
+        """Process a single singer directory. Returns (split_type, wav_count, status).
+        Every failure is caught here, so one bad singer is counted as an error instead of
+        aborting the run before data.csv is rewritten."""
+        split_type = 'train'
         try:
+            src_singer_dir = audio_dir / singer_id
+            
+            # Determine destination
+            split_type = singer_split_map.get(singer_id, 'train')
+            if split_type == 'train':
+                dest_singer_dir = train_dir / singer_id
+            elif split_type == 'test':
+                dest_singer_dir = test_dir / singer_id
+            else:  # exp
+                dest_singer_dir = exp_dir / singer_id
+            
+            # Check if source directory exists
+            if singer_id not in singer_dirs_on_disk:
+                return (split_type, 0, 'no_source')
+            
+            # Check if destination already exists (skip if so)
+            if singer_id in split_dirs_on_disk[split_type]:
+                # Count existing files for stats
+                wav_count = count_wavs(dest_singer_dir)
+                return (split_type, wav_count, 'skipped')
+            
             if args.copy_files:
                 # Copy entire directory tree
-                shutil.copytree(src_singer_dir, dest_singer_dir)
+                shutil.copytree(src_singer_dir, dest_singer_dir, copy_function=copy_file)
             else:
                 # Move entire directory
                 shutil.move(str(src_singer_dir), str(dest_singer_dir))
             
             # Count files moved/copied
-            wav_count = len(list(dest_singer_dir.rglob("*.wav")))
+            wav_count = count_wavs(dest_singer_dir)
             return (split_type, wav_count, 'success')
             
         except Exception as e:
             return (split_type, 0, f'error: {str(e)}')
     
-    # Filter to only singers that need processing
+    def record(singer_id, result):
+        """Add one singer's result to the counters; skipped singers still count their files."""
+        nonlocal skipped, errors
+        split_type, wav_count, status = result
+        if status in ('success', 'skipped'):
+            if status == 'skipped':
+                skipped += 1
+            files_per_split[split_type] += wav_count
+        elif status.startswith('error'):
+            tqdm.write(f"Error processing {singer_id}: {status}")
+            errors += 1
+    
     singers_to_process = list(unique_singer_ids)
     
+    # Both modes feed one accumulation loop; results arrive in singer order
     if getattr(args, 'no_parallel', False):
-        # Sequential processing
         print("Running in sequential mode...")
-        for singer_id in tqdm(singers_to_process, desc="Processing singers"):
-            split_type, wav_count, status = process_singer(singer_id)
-            
-            if status == 'success':
-                if split_type == 'train':
-                    train_files_moved += wav_count
-                elif split_type == 'test':
-                    test_files_moved += wav_count
-                else:
-                    exp_files_moved += wav_count
-            elif status == 'skipped':
-                skipped += 1
-                # Still count the files for statistics
-                if split_type == 'train':
-                    train_files_moved += wav_count
-                elif split_type == 'test':
-                    test_files_moved += wav_count
-                else:
-                    exp_files_moved += wav_count
-            elif status.startswith('error'):
-                print(f"Error processing {singer_id}: {status}")
-                errors += 1
+        executor = nullcontext()
+        results = map(process_singer, singers_to_process)
     else:
-        # Parallel processing
         print("Running in parallel mode...")
-        max_workers = min(32, len(singers_to_process))
-        
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all tasks
-            future_to_singer = {
-                executor.submit(process_singer, singer_id): singer_id
-                for singer_id in singers_to_process
-            }
-            
-            # Process results with progress bar
-            with tqdm(total=len(singers_to_process), desc="Processing singers") as pbar:
-                for future in as_completed(future_to_singer):
-                    singer_id = future_to_singer[future]
-                    try:
-                        split_type, wav_count, status = future.result()
-                        
-                        if status == 'success':
-                            if split_type == 'train':
-                                train_files_moved += wav_count
-                            elif split_type == 'test':
-                                test_files_moved += wav_count
-                            else:
-                                exp_files_moved += wav_count
-                        elif status == 'skipped':
-                            skipped += 1
-                            # Still count the files for statistics
-                            if split_type == 'train':
-                                train_files_moved += wav_count
-                            elif split_type == 'test':
-                                test_files_moved += wav_count
-                            else:
-                                exp_files_moved += wav_count
-                        elif status.startswith('error'):
-                            tqdm.write(f"Error processing {singer_id}: {status}")
-                            errors += 1
-                    except Exception as e:
-                        tqdm.write(f"Exception processing {singer_id}: {str(e)}")
-                        errors += 1
-                    
-                    pbar.update(1)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(32, len(singers_to_process))))
+        results = executor.map(process_singer, singers_to_process)
+    
+    with executor:
+        for singer_id, result in zip(
+            singers_to_process,
+            tqdm(results, total=len(singers_to_process), desc="Processing singers"),
+        ):
+            record(singer_id, result)
     
     if skipped > 0:
         print(f"Skipped {skipped} singers (destination already exists)")
@@ -356,13 +376,11 @@ def main():
     # Update CSV with split information
     print("\nUpdating CSV with split information...")
     
-    def assign_split(singer_id):
-        return singer_split_map.get(singer_id, 'train')
-    
-    df['split'] = df[args.singer_id_header].apply(assign_split)
-    
-    # Convert to numeric (0=train, 1=test, 2=exp)
-    df['split'] = df['split'].map({'train': 0, 'test': 1, 'exp': 2})
+    # Numeric split per singer (0=train, 1=test, 2=exp), mapped onto the rows in one pass.
+    # Singers missing from the map default to train.
+    split_codes = {'train': 0, 'test': 1, 'exp': 2}
+    singer_split_codes = {singer_id: split_codes[split] for singer_id, split in singer_split_map.items()}
+    df['split'] = df[args.singer_id_header].map(singer_split_codes).fillna(0).astype('int8')
     
     # Print split statistics from CSV
     train_songs = (df['split'] == 0).sum()
@@ -376,16 +394,22 @@ def main():
     print(f"Total songs: {len(df)}")
     
     # Save the dataframe back to the input csv file (overwrites in place)
-    df.to_csv(input_csv_path, index=False)
-    print(f"Updated input CSV file with split info: {input_csv_path}")
+    if args.output_format in ("csv", "both"):
+        df.to_csv(input_csv_path, index=False)
+        print(f"Updated input CSV file with split info: {input_csv_path}")
+    if args.output_format in ("parquet", "both"):
+        parquet_path = input_csv_path.with_suffix(".parquet")
+        df.to_parquet(parquet_path, engine="pyarrow", compression="zstd", index=False)
+        print(f"Wrote split table as Parquet: {parquet_path}")
     
     # Create split_by_singer.json if singer_data was provided
     if singer_data:
         print("\nCreating split_by_singer.json...")
         split_by_singer = {}
+        csv_singer_ids = set(unique_singer_ids)
         
         for singer_id, info in singer_data.items():
-            if singer_id not in unique_singer_ids:
+            if singer_id not in csv_singer_ids:
                 continue
             
             split_type = singer_split_map.get(singer_id, "train")
@@ -413,9 +437,9 @@ def main():
     print(f"Train singers: {len(train_singers)}")
     print(f"Test singers: {len(test_singers)}")
     print(f"Exp singers: {len(exp_singers)}")
-    print(f"Train files: {train_files_moved}")
-    print(f"Test files: {test_files_moved}")
-    print(f"Exp files: {exp_files_moved}")
+    print(f"Train files: {files_per_split['train']}")
+    print(f"Test files: {files_per_split['test']}")
+    print(f"Exp files: {files_per_split['exp']}")
     print(f"Errors encountered: {errors}")
     print(f"Total processing time: {elapsed_time:.2f} seconds")
     
@@ -5,6 +5,7 @@ Moves track directories from desilenced_data/{track_name}/ to desilenced_data/{s
 grouping all tracks by the same singer under their ID directory.
 """
 import argparse
+import errno
 import pandas as pd
 import os
 import shutil
@@ -45,9 +46,13 @@ dataset_directory = Path(args.dataset_path)
 csv_path = dataset_directory / "data.csv"
 source_base = dataset_directory / "audio"
 
-# Load the dataset
+# Load the dataset (only the two columns this step uses; names stay strings)
 print(f"Loading dataset from {csv_path}...")
-df = pd.read_csv(csv_path)
+df = pd.read_csv(
+    csv_path,
+    usecols=[args.singer_id_header, args.file_name_header],
+    dtype=str,
+)
 print(f"Loaded dataset with {len(df)} rows")
 
 
@@ -68,32 +73,71 @@ def move_track(row_data: tuple) -> tuple:
     src_path = source_base_path / folder_name
     dest_path = source_base_path / singer_id / folder_name
     
-    # Check if destination already exists
-    if dest_path.exists():
+    # Check if destination already exists (both checks read the startup index, so no stat
+    # calls here; each path is looked at once per run, so a per-path cache would never hit)
+    if folder_name in singer_contents.get(singer_id, ()):
         return ('already', folder_name)
     
     # Check if source exists
-    if not src_path.exists():
+    if folder_name not in top_entries:
         return ('skipped', f'source not found: {folder_name}')
     
     try:
-        # Create singer_id directory if it doesn't exist
-        singer_dir = source_base_path / singer_id
-        singer_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Move the folder
-        shutil.move(str(src_path), str(dest_path))
+        # Move the folder: a rename within the dataset's filesystem is a metadata update.
+        # Only a cross-device move falls back to shutil.move, which copies (via
+        # os.sendfile on Linux) and deletes.
+        try:
+            os.rename(src_path, dest_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(str(src_path), str(dest_path))
         return ('moved', folder_name)
+    except FileNotFoundError:
+        # The index is a snapshot: a duplicate row may already have moved this folder
+        if dest_path.exists():
+            return ('already', folder_name)
+        return ('skipped', f'source not found: {folder_name}')
     except Exception as e:
         return ('error', f'{folder_name}: {str(e)}')
 
 
+def move_batch(batch: list) -> list:
+    """Move a batch of tracks in one pool task; returns their (status, message) results."""
+    return [move_track(item) for item in batch]
+
+
+# Index the audio folder once so existence checks are set lookups rather than a stat per path:
+# top-level entries (unorganized tracks and singer dirs), and the contents of singer dirs in the CSV
+print(f"Indexing {source_base}...")
+with os.scandir(source_base) as it:
+    top_entries = set()
+    top_dirs = set()
+    for entry in it:
+        top_entries.add(entry.name)
+        if entry.is_dir():
+            top_dirs.add(entry.name)
+singer_contents = {}
+for singer_id in top_dirs.intersection(df[args.singer_id_header].dropna()):
+    with os.scandir(source_base / singer_id) as it:
+        singer_contents[singer_id] = {entry.name for entry in it}
+
+# Create each singer_id directory once here, rather than once per track inside the workers.
+# Only singers with at least one track still at the top level get a directory.
+to_move = df[df[args.file_name_header].isin(top_entries)]
+for singer_id in to_move[args.singer_id_header].dropna().unique():
+    if singer_id not in singer_contents:
+        (source_base / singer_id).mkdir(parents=True, exist_ok=True)
+        singer_contents[singer_id] = set()
+
 # Prepare work items
 print(f"Preparing {len(df)} tracks for processing...")
-work_items = [
-    (row[args.singer_id_header], row[args.file_name_header], str(source_base))
-    for _, row in df.iterrows()
-]
+source_base_str = str(source_base)
+work_items = list(zip(
+    df[args.singer_id_header].to_numpy(),
+    df[args.file_name_header].to_numpy(),
+    [source_base_str] * len(df),
+))
 
 # Counters
 moved = 0
@@ -120,20 +164,26 @@ else:
     num_workers = min(32, multiprocessing.cpu_count() * 2)
     print(f"Processing with {num_workers} parallel workers...")
     
+    # One future per batch rather than per track; ~16 batches per worker keeps the load balanced
+    chunksize = max(1, len(work_items) // (num_workers * 16))
+    batches = [work_items[i:i + chunksize] for i in range(0, len(work_items), chunksize)]
+    
     with ThreadPoolExecutor(max_workers=num_workers) as executor:
-        futures = {executor.submit(move_track, item): item for item in work_items}
+        futures = {executor.submit(move_batch, batch): len(batch) for batch in batches}
         
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Moving tracks"):
-            status, msg = future.result()
-            if status == 'moved':
-                moved += 1
-            elif status == 'skipped':
-                skipped += 1
-            elif status == 'already':
-                already_organized += 1
-            elif status == 'error':
-                errors += 1
-                print(f"Error: {msg}")
+        with tqdm(total=len(work_items), desc="Moving tracks") as pbar:
+            for future in as_completed(futures):
+                for status, msg in future.result():
+                    if status == 'moved':
+                        moved += 1
+                    elif status == 'skipped':
+                        skipped += 1
+                    elif status == 'already':
+                        already_organized += 1
+                    elif status == 'error':
+                        errors += 1
+                        print(f"Error: {msg}")
+                pbar.update(futures[future])
 
 # Print summary
 print("\nReorganization complete!")